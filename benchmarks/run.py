@@ -0,0 +1,179 @@
+from typing import Callable, Dict, List, Tuple
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+from poker import Card, Executor, Game, Pocket, ResultCache, Table
+from poker.evaluator import evaluate_strength
+from poker.flops import set_flop_table_enabled
+from poker.vectorized import evaluate_strengths_array, evaluation_state
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# name: (pocket, board) in (val, suit) pairs; boards cover dry, monotone, paired and connected textures
+FIXTURES = {'dry': ([(12, 1), (4, 2)], [(13, 0), (8, 3), (3, 2), (10, 1), (6, 0)]),
+            'monotone': ([(14, 2), (13, 1)], [(2, 2), (7, 2), (11, 2), (5, 0), (9, 3)]),
+            'paired': ([(9, 3), (9, 1)], [(9, 0), (13, 2), (13, 1), (3, 3), (6, 0)]),
+            'connected': ([(8, 3), (7, 3)], [(6, 0), (5, 1), (4, 2), (10, 3), (2, 1)])}
+STREETS = (('pre_flop', 0), ('flop', 3), ('turn', 4), ('river', 5))
+
+
+def best_time(func: Callable, repeat: int, min_seconds: float = 0.05) -> float:
+    # Fast calls are looped until one sample takes min_seconds, so timer noise does not dominate;
+    # garbage collection is paused while timing, as timeit does
+    start = time.perf_counter()
+    func()
+    calls_num = max(1, int(min_seconds / max(time.perf_counter() - start, 1e-9)))
+    times = list()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(calls_num):
+                func()
+            times.append((time.perf_counter() - start) / calls_num)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return min(times)
+
+
+def random_hands(hands_num: int, seed: int = 0) -> List[List[int]]:
+    rnd = random.Random(seed)
+    return [rnd.sample(range(52), 7) for _ in range(hands_num)]
+
+
+def bench_evaluators(repeat: int) -> Dict[str, dict]:
+    hands = random_hands(100000)
+    cards_hands = [[Card((code >> 2) + 2, code & 3) for code in hand] for hand in hands[:20000]]
+    hands_arr = np.array(random_hands(1000000, seed=1), dtype=np.uint8)
+    results = dict()
+    seconds = best_time(lambda: [evaluate_strength(hand) for hand in hands], repeat)
+    results['evaluate_strength'] = {'seconds': seconds, 'hands_per_second': len(hands) / seconds}
+    seconds = best_time(lambda: [Game.get_combination(hand) for hand in cards_hands], repeat)
+    results['get_combination'] = {'seconds': seconds, 'hands_per_second': len(cards_hands) / seconds}
+    seconds = best_time(lambda: evaluate_strengths_array(hands_arr), repeat)
+    results['evaluate_strengths_array'] = {'seconds': seconds, 'hands_per_second': len(hands_arr) / seconds}
+    # The same hands with the first three cards as a shared board state, as the showdowns evaluate them
+    flop_state = evaluation_state(hands_arr[0, :3])
+    flop_hands = hands_arr[:, 3:][~np.isin(hands_arr[:, 3:], hands_arr[0, :3]).any(axis=1)]
+    seconds = best_time(lambda: evaluate_strengths_array(flop_hands, flop_state), repeat)
+    results['evaluate_strengths_array.board_state'] = {'seconds': seconds,
+                                                       'hands_per_second': len(flop_hands) / seconds}
+    return results
+
+
+def bench_streets(repeat: int, executor: Executor) -> Dict[str, dict]:
+    # Every street starts from a fresh Game without cache, so nothing is reused between runs. The flop
+    # table is disabled, so flops are enumerated whether or not the table was built on this machine
+    results = dict()
+    set_flop_table_enabled(False)
+    try:
+        for name, (pocket_sv, board_sv) in FIXTURES.items():
+            pocket = [Card(val, suit) for val, suit in pocket_sv]
+            board = [Card(val, suit) for val, suit in board_sv]
+            for street, board_cards_num in STREETS:
+                def process():
+                    game = Game(Pocket(list(pocket)), Table(board[:board_cards_num]), opponents_num=1,
+                                executor=executor, cache=ResultCache(0))
+                    return getattr(game, 'process_' + street)()
+                results['{}.{}'.format(street, name)] = {'seconds': best_time(process, repeat)}
+    finally:
+        set_flop_table_enabled(True)
+    return results
+
+
+def run(repeat: int, workers: int) -> dict:
+    with Executor('serial' if workers == 1 else None, workers) as executor:
+        results = bench_evaluators(repeat)
+        results.update(bench_streets(repeat, executor))
+    return {'meta': {'python': platform.python_version(),
+                     'numpy': np.__version__,
+                     'platform': platform.platform(),
+                     'cpu_count': os.cpu_count(),
+                     'workers': workers,
+                     'repeat': repeat,
+                     'date': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'results': results}
+
+
+def compare(current: dict, baseline: dict, threshold: float, overrides: Dict[str, float],
+            min_delta: float = 1e-4) -> List[Tuple[str, float, float, float]]:
+    # A benchmark regresses when its time grows by more than its threshold relative to the baseline
+    # and by more than min_delta seconds, which keeps sub-millisecond jitter from failing the run
+    regressions = list()
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        limit = overrides.get(name, threshold)
+        base_seconds = baseline['results'][name]['seconds']
+        change = result['seconds'] / base_seconds - 1
+        if change > limit and result['seconds'] - base_seconds > min_delta:
+            regressions.append((name, base_seconds, result['seconds'], change))
+    return regressions
+
+
+def missing_benchmarks(current: dict, baseline: dict) -> List[str]:
+    # Baseline entries the current run did not produce, e.g. a renamed or removed benchmark; they fail
+    # the comparison rather than silently dropping out of it
+    return [name for name in baseline['results'] if name not in current['results']]
+
+
+def print_report(current: dict, baseline: dict = None) -> None:
+    for name, result in current['results'].items():
+        line = '{:<40}{:>12.2f} ms'.format(name, 1000 * result['seconds'])
+        if 'hands_per_second' in result:
+            line += '{:>16,.0f} hands/s'.format(result['hands_per_second'])
+        if baseline is not None and name in baseline['results']:
+            line += '{:>+10.1%}'.format(result['seconds'] / baseline['results'][name]['seconds'] - 1)
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the evaluator and every street')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per benchmark, the best one is kept')
+    parser.add_argument('--workers', type=int, default=1, help='executor workers, 1 runs serially')
+    parser.add_argument('--output', help='save results as JSON')
+    parser.add_argument('--baseline', help='compare against a saved JSON, default: {}'.format(BASELINE_PATH))
+    parser.add_argument('--compare', action='store_true', help='compare against the baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative slowdown')
+    parser.add_argument('--min-delta', type=float, default=1e-4, help='ignored absolute slowdown, seconds')
+    parser.add_argument('--override', action='append', default=[], metavar='NAME=THRESHOLD',
+                        help='per-benchmark threshold')
+    args = parser.parse_args()
+
+    current = run(args.repeat, args.workers)
+    baseline = None
+    if args.compare or args.baseline:
+        with open(args.baseline or BASELINE_PATH) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_report(current, baseline)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(current, output_file, indent=2)
+    if baseline is not None:
+        overrides = {name: float(value) for name, value in (item.split('=') for item in args.override)}
+        regressions = compare(current, baseline, args.threshold, overrides, args.min_delta)
+        for name, base_seconds, seconds, change in regressions:
+            print('REGRESSION {}: {:.2f} ms -> {:.2f} ms ({:+.1%})'.format(
+                name, 1000 * base_seconds, 1000 * seconds, change))
+        missing = missing_benchmarks(current, baseline)
+        for name in missing:
+            print('MISSING {}: in the baseline but not measured'.format(name))
+        for name in current['results']:
+            if name not in baseline['results']:
+                print('NEW {}: not in the baseline, regenerate it with --output'.format(name))
+        if regressions or missing:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
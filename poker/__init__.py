@@ -1,3 +1,52 @@
-from .combinations import *
-from .objects import *
-from .game_stages import *
+import importlib
+
+# Public names by submodule. A submodule is imported on first use of one of its names, so `import poker`
+# does not load NumPy, the evaluator tables or multiprocessing until something needs them. The last
+# entries keep the engine names the package used to re-export through its star imports
+_EXPORTS = {
+    'canonical': ('SUIT_PERMUTATIONS', 'canonical_form', 'canonical_key', 'ResultCache', 'get_default_cache'),
+    'combinations': ('has_royal_flush', 'has_straight_flush', 'has_four_of_a_kind', 'has_full_house', 'has_flush',
+                     'has_straight', 'has_three_of_a_kind', 'has_two_pair', 'has_pair', 'royal_flush_combinations',
+                     'straight_flush_combinations', 'four_of_a_kind_combinations', 'full_house_combinations',
+                     'flush_combinations', 'straight_combinations', 'three_of_a_kind_combinations',
+                     'two_pair_combinations', 'pair_combinations'),
+    'objects': ('Card', 'ALL_CARDS', 'ALL_CARDS_BY_CODE', 'parse_cards', 'Pocket', 'Table', 'Deck', 'BitDeck'),
+    'evaluator': ('RANKS_NUM', 'SUITS_NUM', 'CARDS_NUM', 'ROYAL_FLUSH', 'STRAIGHT_FLUSH', 'FOUR_OF_A_KIND',
+                  'FULL_HOUSE', 'FLUSH', 'STRAIGHT', 'THREE_OF_A_KIND', 'TWO_PAIR', 'PAIR', 'HIGH_CARD', 'card_code',
+                  'code_card', 'cards_codes', 'category_strength', 'strength_category', 'evaluate_strength',
+                  'evaluate_strengths', 'evaluate_category'),
+    'executor': ('Executor', 'get_default_executor', 'set_default_executor'),
+    'game_stages': ('STREET_METHODS', 'MIN_SHARED_POCKETS', 'check_opponents_num', 'validate_hand', 'board_results',
+                    'profiled', 'cached_street', 'Game'),
+    'profiling': ('Profiler', 'phase', 'Sink'),
+    'ranges': ('CATEGORIES_NUM', 'COMBOS_NUM', 'COMBOS', 'COMBO_INDEX', 'RANK_CHARS', 'RUNOUTS_BATCH', 'HandRange',
+               'comparison_weights', 'weighted_comparisons', 'RangeShowdown', 'PocketsShowdown', 'range_equity'),
+    'flops': ('get_flop_table',),
+    'monte_carlo': ('MonteCarloEquity',),
+    'preflop': ('preflop_equity',),
+    'ranking': ('rank_combination', 'unrank_combination'),
+    'showdown': ('RunoutShowdown',),
+    'vectorized': ('combinations_array', 'evaluate_strengths_array', 'evaluation_state', 'strengths_categories'),
+}
+_NAME_MODULES = {name: module_name for module_name, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_NAME_MODULES)
+
+
+def __getattr__(name: str):
+    # Submodules themselves, e.g. poker.showdown, are imported on first access as well
+    module_name = _NAME_MODULES.get(name)
+    if module_name is None:
+        try:
+            return importlib.import_module('.' + name, __name__)
+        except ModuleNotFoundError as exc:
+            if exc.name != '{}.{}'.format(__name__, name):
+                raise
+            raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name)) from None
+    value = getattr(importlib.import_module('.' + module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
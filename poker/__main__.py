@@ -0,0 +1,105 @@
+from typing import List, Sequence
+import argparse
+import importlib
+import shlex
+import sys
+import threading
+import time
+
+from .objects import Card, Pocket, Table, parse_cards
+
+STREETS = (('Pre-flop', 0, 'process_pre_flop'), ('Flop', 3, 'process_flop'), ('Turn', 4, 'process_turn'),
+           ('River', 5, 'process_river'))
+PROMPT = 'poker> '
+# game_stages imports the street engines lazily, the REPL preloads them
+ENGINE_MODULES = ('poker.game_stages', 'poker.flops', 'poker.monte_carlo')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m poker',
+                                     description='Win probability of a hand on every street dealt so far. '
+                                                 'Cards are value then suit, e.g. Qd 4c --board 2h Qh 4h')
+    parser.add_argument('pocket', nargs='*', help='2 pocket cards; without them an interactive session starts')
+    parser.add_argument('-b', '--board', nargs='*', default=[], help='0, 3, 4 or 5 board cards')
+    parser.add_argument('-o', '--opponents', type=int, default=1)
+    parser.add_argument('-w', '--workers', type=int, default=None, help='worker processes for multi-way flops')
+    parser.add_argument('-t', '--timing', action='store_true', help='print the time of every street')
+    return parser
+
+
+def hand_lines(pocket_cards: List[Card], board_cards: List[Card], opponents_num: int, executor,
+               timing: bool = False) -> List[str]:
+    # The engine is imported with the first hand, so --help never waits for it
+    from .game_stages import Game, validate_hand
+    validate_hand([card.code for card in pocket_cards], [card.code for card in board_cards])
+    game = Game(Pocket(pocket_cards), Table(board_cards), opponents_num, executor)
+    lines = list()
+    for street_name, board_cards_num, method in STREETS:
+        if board_cards_num > len(board_cards):
+            break
+        start = time.perf_counter()
+        result = getattr(game, method)()
+        lines.append('--- {} ---'.format(street_name))
+        lines.append('Win prob: {:.2f}%'.format(100 * result['win_prob']) +
+                     ('  ({:.1f} ms)'.format(1000 * (time.perf_counter() - start)) if timing else ''))
+    return lines
+
+
+def load_engine() -> None:
+    for name in ENGINE_MODULES:
+        importlib.import_module(name)
+
+
+def repl(parser: argparse.ArgumentParser, defaults: argparse.Namespace, executor) -> None:
+    # Every line is a command line of its own, e.g. `Qd 4c -b 2h Qh 4h -o 2`; opponents and timing default
+    # to the session's. The evaluator tables, result cache and worker pool stay loaded between hands
+    # The engine loads in the background while the first hand is typed
+    threading.Thread(target=load_engine, daemon=True).start()
+    print('Enter a hand as `Qd 4c -b 2h Qh 4h -o 2`, `quit` to leave')
+    while True:
+        try:
+            line = input(PROMPT).strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            break
+        if line in ('quit', 'exit', 'q'):
+            break
+        if not line:
+            continue
+        try:
+            args = parser.parse_args(shlex.split(line), argparse.Namespace(**vars(defaults)))
+            for output_line in hand_lines(parse_cards(args.pocket), parse_cards(args.board), args.opponents,
+                                          executor, args.timing):
+                print(output_line)
+        except SystemExit:
+            # argparse already printed the usage error or the help
+            continue
+        except ValueError as exc:
+            print('Error: {}'.format(exc))
+
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        pocket_cards = parse_cards(args.pocket)
+        board_cards = parse_cards(args.board)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    from .executor import Executor
+    with Executor(workers=args.workers) as executor:
+        if not pocket_cards:
+            repl(parser, argparse.Namespace(pocket=[], board=[], opponents=args.opponents, workers=args.workers,
+                                            timing=args.timing), executor)
+            return 0
+        try:
+            lines = hand_lines(pocket_cards, board_cards, args.opponents, executor, args.timing)
+        except ValueError as exc:
+            parser.error(str(exc))
+        print('\n'.join(lines))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+from collections import deque
+from typing import IO, Iterable, Iterator, List, Tuple, Union
+import argparse
+import csv
+import json
+import sys
+import time
+
+from .canonical import ResultCache
+from .executor import Executor
+from .evaluator import cards_codes
+from .game_stages import Game, check_opponents_num, validate_hand
+from .objects import ALL_CARDS_BY_CODE, Pocket, Table, parse_cards
+
+STREETS = ('pre_flop', 'flop', 'turn', 'river')
+FIELDS = ('id',) + STREETS + ('error',)
+# Hand record: (id, pocket codes, board codes, opponents number)
+HandRecord = Tuple[str, Tuple[int, ...], Tuple[int, ...], int]
+# A line that could not be parsed: (id, error message), answered with an error row
+BadRecord = Tuple[str, str]
+
+_serial_executor = Executor('serial')
+_worker_cache = None
+
+
+def parse_hand(record: dict, default_id: str) -> HandRecord:
+    pocket_codes = tuple(cards_codes(parse_cards(record['pocket'])))
+    board_codes = tuple(cards_codes(parse_cards(record.get('board') or ())))
+    validate_hand(pocket_codes, board_codes)
+    hand_id = record.get('id')
+    opponents_num = record.get('opponents', 1)
+    if isinstance(opponents_num, str):
+        # CSV cells are strings, and an empty cell means the column's default
+        opponents_num = int(opponents_num) if opponents_num.strip() else 1
+    return (default_id if hand_id in (None, '') else str(hand_id), pocket_codes, board_codes,
+            check_opponents_num(opponents_num))
+
+
+def read_hands(input_file: IO, input_format: str) -> Iterator[Union[HandRecord, BadRecord]]:
+    # JSONL: one {"id", "pocket", "board", "opponents"} object per line; CSV: a header with the same columns.
+    # A line that cannot be parsed becomes a BadRecord, so one bad line does not stop a long run
+    if input_format == 'csv':
+        records = enumerate(csv.DictReader(input_file), 2)
+    else:
+        records = ((line_num, line) for line_num, line in enumerate(input_file, 1) if line.strip())
+    for line_num, record in records:
+        try:
+            if isinstance(record, str):
+                record = json.loads(record)
+                if not isinstance(record, dict):
+                    raise ValueError('Expected a JSON object')
+            hand = parse_hand(record, str(line_num))
+        except (KeyError, TypeError, ValueError) as exc:
+            hand_id = record.get('id') if isinstance(record, dict) else None
+            hand = (str(line_num) if hand_id in (None, '') else str(hand_id),
+                    'Line {}: {}: {}'.format(line_num, type(exc).__name__, exc))
+        yield hand
+
+
+def analyse_hands(hands: List[Union[HandRecord, BadRecord]]) -> List[dict]:
+    # Runs in a worker: every hand is processed serially, so parallelism comes from hands only. The
+    # flop showdown is reused for the turn and river, and repeated spots hit the worker cache
+    global _worker_cache
+    if _worker_cache is None:
+        _worker_cache = ResultCache()
+    results = list()
+    for hand in hands:
+        if len(hand) == 2:
+            results.append(dict(dict.fromkeys(FIELDS), id=hand[0], error=hand[1]))
+            continue
+        hand_id, pocket_codes, board_codes, opponents_num = hand
+        board = [ALL_CARDS_BY_CODE[code] for code in board_codes]
+        game = Game(Pocket([ALL_CARDS_BY_CODE[code] for code in pocket_codes]), Table(board), opponents_num,
+                    _serial_executor, _worker_cache)
+        result = dict.fromkeys(FIELDS)
+        result['id'] = hand_id
+        result['pre_flop'] = game.process_pre_flop()['win_prob']
+        if len(board) >= 3:
+            result['flop'] = game.process_flop()['win_prob']
+        if len(board) >= 4:
+            result['turn'] = game.process_turn()['win_prob']
+        if len(board) == 5:
+            result['river'] = game.process_river()['win_prob']
+        results.append(result)
+    return results
+
+
+def iter_batches(hands: Iterable, batch_size: int) -> Iterator[List]:
+    batch = list()
+    for hand in hands:
+        batch.append(hand)
+        if len(batch) == batch_size:
+            yield batch
+            batch = list()
+    if batch:
+        yield batch
+
+
+def analyse_stream(hands: Iterable[Union[HandRecord, BadRecord]], executor: Executor, batch_size: int = 16,
+                   window: int = None) -> Iterator[dict]:
+    # At most `window` batches are in flight, so memory stays bounded whatever the input size,
+    # and results are yielded in input order as soon as their batch is done
+    window = window or 4 * executor.workers
+    pending = deque()
+    for batch in iter_batches(hands, batch_size):
+        pending.append(executor.submit(analyse_hands, batch))
+        if len(pending) >= window:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+class ResultWriter(object):
+
+    def __init__(self, output_file: IO, output_format: str) -> None:
+        self.output_file = output_file
+        self.output_format = output_format
+        self._csv_writer = None
+        if output_format == 'csv':
+            self._csv_writer = csv.DictWriter(output_file, FIELDS)
+            self._csv_writer.writeheader()
+
+    def write(self, result: dict) -> None:
+        if self._csv_writer is not None:
+            self._csv_writer.writerow(result)
+        else:
+            self.output_file.write(json.dumps(result) + '\n')
+
+    def flush(self) -> None:
+        self.output_file.flush()
+
+
+def file_format(path: str, default: str = 'jsonl') -> str:
+    return 'csv' if path.lower().endswith('.csv') else default
+
+
+def run(input_file: IO, output_file: IO, input_format: str, output_format: str, executor: Executor,
+        batch_size: int = 16, report_every: float = 10., log: IO = sys.stderr) -> dict:
+    writer = ResultWriter(output_file, output_format)
+    start = last_report = time.perf_counter()
+    hands_num = errors_num = 0
+    for result in analyse_stream(read_hands(input_file, input_format), executor, batch_size):
+        writer.write(result)
+        hands_num += 1
+        errors_num += result['error'] is not None
+        now = time.perf_counter()
+        if log is not None and now - last_report >= report_every:
+            writer.flush()
+            log.write('{} hands, {:.1f} hands/s\n'.format(hands_num, hands_num / (now - start)))
+            last_report = now
+    writer.flush()
+    elapsed = time.perf_counter() - start
+    return {'hands': hands_num, 'errors': errors_num, 'elapsed': elapsed,
+            'hands_per_second': hands_num / elapsed if elapsed else 0.}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Score logged hands: win probability on every street')
+    parser.add_argument('input', help='JSONL or CSV file of hands, - for stdin')
+    parser.add_argument('output', help='JSONL or CSV file of results, - for stdout')
+    parser.add_argument('--input-format', choices=('jsonl', 'csv'), default=None)
+    parser.add_argument('--output-format', choices=('jsonl', 'csv'), default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=16, help='hands per worker task')
+    args = parser.parse_args()
+    input_format = args.input_format or file_format(args.input)
+    output_format = args.output_format or file_format(args.output)
+
+    input_file = sys.stdin if args.input == '-' else open(args.input, newline='')
+    output_file = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    try:
+        with Executor(workers=args.workers) as executor:
+            stats = run(input_file, output_file, input_format, output_format, executor, args.batch_size)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    sys.stderr.write('Scored {} hands ({} invalid) in {:.1f}s, {:.1f} hands/s\n'.format(
+        stats['hands'], stats['errors'], stats['elapsed'], stats['hands_per_second']))
+
+
+if __name__ == '__main__':
+    main()
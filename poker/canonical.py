@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from itertools import permutations
+from typing import Any, Hashable, Sequence, Tuple
+import threading
+
+SUIT_PERMUTATIONS = list(permutations(range(4)))
+
+
+def canonical_form(pocket_codes: Sequence[int], board_codes: Sequence[int]) -> Tuple[Tuple, Tuple[int, ...]]:
+    # Smallest representation over all 24 suit relabelings and the relabeling (suit -> suit) that gives
+    # it; pocket and flop cards are unordered, turn and river keep their street
+    best = None
+    for perm in SUIT_PERMUTATIONS:
+        mapped_pocket = tuple(sorted((code & ~3) | perm[code & 3] for code in pocket_codes))
+        mapped_board = [(code & ~3) | perm[code & 3] for code in board_codes]
+        key = (mapped_pocket, tuple(sorted(mapped_board[:3])), tuple(mapped_board[3:]))
+        if best is None or key < best[0]:
+            best = key, perm
+    return best
+
+
+def canonical_key(pocket_codes: Sequence[int], board_codes: Sequence[int]) -> Tuple:
+    return canonical_form(pocket_codes, board_codes)[0]
+
+
+class ResultCache(object):
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._items),
+                'maxsize': self.maxsize,
+                'hit_rate': self.hits / requests if requests else 0.}
+
+
+_default_cache = None
+
+
+def get_default_cache() -> ResultCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache()
+    return _default_cache
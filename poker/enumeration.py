@@ -0,0 +1,65 @@
+from functools import lru_cache
+from math import comb
+from typing import Iterator, Tuple
+
+import numpy as np
+
+from .ranking import unrank_combination
+from .vectorized import combinations_array
+
+# Chunk descriptor (n, k, start, stop): the lexicographic k-subsets of range(n) with indices in
+# [start, stop). Descriptors are a few integers, so they are cheap to ship to workers, which
+# regenerate the chunk locally by unranking
+ChunkDescriptor = Tuple[int, int, int, int]
+
+
+@lru_cache(maxsize=None)
+def binomial_table(n: int) -> np.ndarray:
+    # binomial_table(n)[a, b] == C(a, b) for 0 <= a, b <= n
+    table = np.zeros((n + 1, n + 1), dtype=np.int64)
+    for a in range(n + 1):
+        for b in range(a + 1):
+            table[a, b] = comb(a, b)
+    table.flags.writeable = False
+    return table
+
+
+def rank_combinations_array(subsets: np.ndarray, n: int) -> np.ndarray:
+    subsets_num, k = subsets.shape
+    if k == 0:
+        return np.zeros(subsets_num, dtype=np.int64)
+    binomials = binomial_table(n)
+    ranks = np.full(subsets_num, comb(n, k) - 1, dtype=np.int64)
+    for i in range(k):
+        ranks -= binomials[n - 1 - subsets[:, i].astype(np.intp), k - i]
+    return ranks
+
+
+def chunk_descriptors(n: int, k: int, chunk_size: int) -> Iterator[ChunkDescriptor]:
+    total = comb(n, k)
+    for start in range(0, total, chunk_size):
+        yield n, k, start, min(start + chunk_size, total)
+
+
+def generate_chunk(descriptor: ChunkDescriptor) -> np.ndarray:
+    n, k, start, stop = descriptor
+    if k == 0:
+        return combinations_array(n, 0)[start:stop]
+    # Subsets with smallest element `lead` form one block of the lexicographic order, and their other
+    # elements are the tail of the (k - 1)-subsets of range(n - 1) shifted by one, so one shared array
+    # serves every block
+    tails = combinations_array(n - 1, k - 1)
+    chunk = np.empty((stop - start, k), dtype=np.uint8)
+    lead = unrank_combination(start, n, k)[0]
+    block_start = comb(n, k) - comb(n - lead, k)
+    position = start
+    while position < stop:
+        block_size = comb(n - lead - 1, k - 1)
+        block_stop = min(block_start + block_size, stop)
+        offset = len(tails) - block_size + position - block_start
+        chunk[position - start:block_stop - start, 0] = lead
+        chunk[position - start:block_stop - start, 1:] = tails[offset:offset + block_stop - position] + 1
+        position = block_stop
+        block_start += block_size
+        lead += 1
+    return chunk
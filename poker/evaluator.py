@@ -0,0 +1,150 @@
+from typing import Iterable, List, Sequence
+
+from .objects import Card
+
+RANKS_NUM = 13
+SUITS_NUM = 4
+CARDS_NUM = RANKS_NUM * SUITS_NUM
+
+ROYAL_FLUSH = 0
+STRAIGHT_FLUSH = 1
+FOUR_OF_A_KIND = 2
+FULL_HOUSE = 3
+FLUSH = 4
+STRAIGHT = 5
+THREE_OF_A_KIND = 6
+TWO_PAIR = 7
+PAIR = 8
+HIGH_CARD = 9
+
+_MASKS_NUM = 1 << RANKS_NUM
+
+# Strength layout (higher is stronger): bits 21..24 hold 9 - category, bits 17..20 the major rank
+# (quads, trips, top pair, straight top), bits 13..16 the minor rank (full house pair, second pair)
+# and bits 0..12 the kicker rank mask. Kicker masks of equal size compare like sorted rank lists.
+_CATEGORY_SHIFT = 21
+_MAJOR_SHIFT = 17
+_MINOR_SHIFT = 13
+
+
+# Card code layout: bits 2..5 hold rank index (0 for 2, ..., 12 for A), bits 0..1 hold suit
+def card_code(card: Card) -> int:
+    return card.code
+
+
+def code_card(code: int) -> Card:
+    return Card((code >> 2) + 2, code & 3)
+
+
+def cards_codes(cards: Sequence[Card]) -> List[int]:
+    return [card.code for card in cards]
+
+
+def _build_popcount() -> List[int]:
+    table = [0] * _MASKS_NUM
+    for mask in range(1, _MASKS_NUM):
+        table[mask] = table[mask >> 1] + (mask & 1)
+    return table
+
+
+def _build_straight_high() -> List[int]:
+    # 0 if mask holds no straight, otherwise rank index of the straight's top card + 1
+    table = [0] * _MASKS_NUM
+    for mask in range(_MASKS_NUM):
+        low_ace_mask = (mask << 1) | ((mask >> 12) & 1)
+        runs = low_ace_mask & (low_ace_mask >> 1) & (low_ace_mask >> 2) & (low_ace_mask >> 3) & (low_ace_mask >> 4)
+        if runs:
+            table[mask] = runs.bit_length() + 3
+    return table
+
+
+def _build_top_bits(popcount: List[int]) -> List[List[int]]:
+    # _TOP_BITS[k][mask] keeps only the k highest set bits of mask
+    tables = []
+    for k in range(6):
+        table = list(range(_MASKS_NUM))
+        for mask in range(_MASKS_NUM):
+            if popcount[mask] > k:
+                table[mask] = table[mask & (mask - 1)]
+        tables.append(table)
+    return tables
+
+
+_POPCOUNT = _build_popcount()
+_STRAIGHT_HIGH = _build_straight_high()
+_TOP_BITS = _build_top_bits(_POPCOUNT)
+
+
+def category_strength(category: int) -> int:
+    return (HIGH_CARD - category) << _CATEGORY_SHIFT
+
+
+def strength_category(strength: int) -> int:
+    return HIGH_CARD - (strength >> _CATEGORY_SHIFT)
+
+
+def evaluate_strength(codes: Sequence[int]) -> int:
+    # Single pass over the cards: rank multiplicity masks (m1 has every rank present,
+    # m2 ranks present at least twice, ...) and per-suit rank masks
+    m1 = m2 = m3 = m4 = 0
+    suit_masks = [0, 0, 0, 0]
+    for code in codes:
+        bit = 1 << (code >> 2)
+        suit_masks[code & 3] |= bit
+        if m3 & bit:
+            m4 |= bit
+        elif m2 & bit:
+            m3 |= bit
+        elif m1 & bit:
+            m2 |= bit
+        else:
+            m1 |= bit
+
+    flush_strength = 0
+    for suit_mask in suit_masks:
+        if _POPCOUNT[suit_mask] >= 5:
+            straight_high = _STRAIGHT_HIGH[suit_mask]
+            if straight_high == RANKS_NUM:
+                return category_strength(ROYAL_FLUSH)
+            if straight_high:
+                return category_strength(STRAIGHT_FLUSH) | (straight_high - 1) << _MAJOR_SHIFT
+            flush_strength = category_strength(FLUSH) | _TOP_BITS[5][suit_mask]
+            break
+
+    if m4:
+        major = m4.bit_length() - 1
+        return (category_strength(FOUR_OF_A_KIND) | major << _MAJOR_SHIFT |
+                _TOP_BITS[1][m1 & ~(1 << major)])
+    if m3:
+        major = m3.bit_length() - 1
+        pairs = m2 & ~(1 << major)
+        if pairs:
+            return (category_strength(FULL_HOUSE) | major << _MAJOR_SHIFT |
+                    (pairs.bit_length() - 1) << _MINOR_SHIFT)
+    if flush_strength:
+        return flush_strength
+    straight_high = _STRAIGHT_HIGH[m1]
+    if straight_high:
+        return category_strength(STRAIGHT) | (straight_high - 1) << _MAJOR_SHIFT
+    if m3:
+        major = m3.bit_length() - 1
+        return (category_strength(THREE_OF_A_KIND) | major << _MAJOR_SHIFT |
+                _TOP_BITS[2][m1 & ~(1 << major)])
+    if m2:
+        if _POPCOUNT[m2] >= 2:
+            pairs = _TOP_BITS[2][m2]
+            major = pairs.bit_length() - 1
+            minor = (pairs & ~(1 << major)).bit_length() - 1
+            return (category_strength(TWO_PAIR) | major << _MAJOR_SHIFT | minor << _MINOR_SHIFT |
+                    _TOP_BITS[1][m1 & ~pairs])
+        major = m2.bit_length() - 1
+        return category_strength(PAIR) | major << _MAJOR_SHIFT | _TOP_BITS[3][m1 & ~m2]
+    return category_strength(HIGH_CARD) | _TOP_BITS[5][m1]
+
+
+def evaluate_strengths(hands: Iterable[Sequence[int]]) -> List[int]:
+    return [evaluate_strength(codes) for codes in hands]
+
+
+def evaluate_category(codes: Sequence[int]) -> int:
+    return HIGH_CARD - (evaluate_strength(codes) >> _CATEGORY_SHIFT)
@@ -0,0 +1,120 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import chain, islice
+from typing import Any, Callable, Iterable, Iterator, List
+import atexit
+import os
+import sys
+
+
+class Executor(object):
+    BACKENDS = ('process', 'thread', 'serial')
+
+    def __init__(self, backend: str = None, workers: int = None) -> None:
+        if backend is None:
+            backend = Executor.default_backend()
+        if backend not in Executor.BACKENDS:
+            raise ValueError('Unknown executor backend `{}`, expected one of {}'.format(backend, Executor.BACKENDS))
+        self.backend = backend
+        self.workers = 1 if backend == 'serial' else (workers or os.cpu_count() or 1)
+        self._pool = None
+
+    @staticmethod
+    def default_backend() -> str:
+        # Threads run truly in parallel only on free-threaded builds
+        gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+        return 'process' if gil_enabled else 'thread'
+
+    def __enter__(self) -> 'Executor':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.shutdown()
+
+    @property
+    def started(self) -> bool:
+        return self._pool is not None
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.backend == 'process':
+                # multiprocessing is imported with the first pool, which keeps short runs that never
+                # start one fast. Workers share the POSIX resource tracker of this process, which
+                # unregisters the shared memory segments they attach to as soon as this process unlinks them
+                from concurrent.futures import ProcessPoolExecutor
+                from multiprocessing import resource_tracker
+                if os.name == 'posix':
+                    resource_tracker.ensure_running()
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def submit(self, func: Callable, *args) -> Future:
+        if self.backend == 'serial':
+            future = Future()
+            try:
+                future.set_result(func(*args))
+            except BaseException as exc:
+                future.set_exception(exc)
+            return future
+        return self._get_pool().submit(func, *args)
+
+    def map(self, func: Callable, iterable: Iterable) -> List[Any]:
+        return list(self.imap(func, iterable))
+
+    def imap(self, func: Callable, iterable: Iterable, window: int = None) -> Iterator[Any]:
+        # Results are yielded in task order as soon as they are ready, so callers can merge them
+        # incrementally instead of holding every result at once. At most `window` tasks are in flight,
+        # so tasks are drawn from the iterable as workers free up rather than all submitted up front
+        tasks = iter(iterable)
+        if self.backend == 'serial':
+            return (func(task) for task in tasks)
+        head = list(islice(tasks, 2))
+        # A single task is not worth a round trip to a worker
+        if len(head) <= 1:
+            return (func(task) for task in head)
+        return self._imap_window(func, chain(head, tasks), window or 2 * self.workers)
+
+    def _imap_window(self, func: Callable, tasks: Iterator, window: int) -> Iterator[Any]:
+        pool = self._get_pool()
+        pending = deque()
+        try:
+            for task in tasks:
+                pending.append(pool.submit(func, task))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Tasks of an abandoned iteration are not left running
+            for future in pending:
+                future.cancel()
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+
+_default_executor = None
+
+
+def get_default_executor() -> Executor:
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = Executor()
+    return _default_executor
+
+
+def set_default_executor(executor: Executor) -> None:
+    global _default_executor
+    if _default_executor is not None and _default_executor is not executor:
+        _default_executor.shutdown()
+    _default_executor = executor
+
+
+@atexit.register
+def _shutdown_default_executor() -> None:
+    if _default_executor is not None:
+        _default_executor.shutdown()
@@ -0,0 +1,161 @@
+from itertools import combinations
+from math import comb
+from typing import Dict, List, Optional, Sequence, Tuple
+import argparse
+import os
+import struct
+import time
+
+import numpy as np
+
+from .canonical import canonical_form
+from .evaluator import CARDS_NUM
+from .executor import Executor
+from .ranges import COMBOS_NUM, COMBO_INDEX, PocketsShowdown
+from .showdown import CATEGORIES_NUM
+from .vectorized import combinations_array, evaluate_strengths_array, evaluation_state, strengths_categories
+
+# Header: magic, format version, flops number, combos number, categories number
+_MAGIC = b'PKFL'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHHHH')
+FLOPS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'flop_equity.bin')
+
+_flop_table = None
+_flop_table_enabled = True
+
+
+def canonical_flop(flop_codes: Sequence[int]) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    # Smallest sorted flop over all suit relabelings and the relabeling that gives it
+    (_, flop, _), perm = canonical_form((), flop_codes)
+    return flop, perm
+
+
+def canonical_flops() -> List[Tuple[int, ...]]:
+    return sorted({canonical_flop(flop)[0] for flop in combinations(range(CARDS_NUM), 3)})
+
+
+def flop_counts(flop_codes: Sequence[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # For every pocket (by combo index) the numbers of won and tied heads-up showdowns over all
+    # turn/river runouts and opponent pockets, and the opponent category counts over all unseen
+    # 4-card sets (each set is 6 runout/pocket splits)
+    showdown = PocketsShowdown.compute(flop_codes)
+    wins = np.zeros(COMBOS_NUM, dtype=np.uint32)
+    ties = np.zeros(COMBOS_NUM, dtype=np.uint32)
+    wins[showdown.live] = showdown.wins
+    ties[showdown.live] = showdown.ties
+    deck = np.array([code for code in range(CARDS_NUM) if code not in flop_codes], dtype=np.uint8)
+    opp_strengths = evaluate_strengths_array(deck[combinations_array(len(deck), 4)], evaluation_state(flop_codes))
+    categories = np.bincount(strengths_categories(opp_strengths), minlength=CATEGORIES_NUM).astype(np.uint32)
+    return wins, ties, categories
+
+
+def build_flop_table(executor: Executor = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    if executor is None:
+        executor = Executor()
+    flops = np.array(canonical_flops(), dtype=np.uint8)
+    results = executor.map(flop_counts, [tuple(flop.tolist()) for flop in flops])
+    wins, ties, categories = (np.array(part) for part in zip(*results))
+    return flops, wins, ties, categories
+
+
+def save_flop_table(flops: np.ndarray, wins: np.ndarray, ties: np.ndarray, categories: np.ndarray,
+                    path: str = FLOPS_PATH) -> None:
+    # Count arrays first, so each of them starts 4-byte aligned; flop cards last
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as table_file:
+        table_file.write(_HEADER.pack(_MAGIC, _VERSION, len(flops), COMBOS_NUM, CATEGORIES_NUM))
+        for part in (wins, ties, categories):
+            table_file.write(np.ascontiguousarray(part, dtype='<u4').tobytes())
+        table_file.write(np.ascontiguousarray(flops, dtype=np.uint8).tobytes())
+
+
+class FlopTable(object):
+    # Memory-mapped per-flop counts: pages are loaded on first use and shared by every process
+    # mapping the file
+
+    def __init__(self, path: str = FLOPS_PATH) -> None:
+        with open(path, 'rb') as table_file:
+            magic, version, flops_num, combos_num, categories_num = _HEADER.unpack(table_file.read(_HEADER.size))
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError('{} is not a flop equity table of version {}'.format(path, _VERSION))
+        offset = _HEADER.size
+        self.wins = np.memmap(path, dtype='<u4', mode='r', offset=offset, shape=(flops_num, combos_num))
+        offset += self.wins.nbytes
+        self.ties = np.memmap(path, dtype='<u4', mode='r', offset=offset, shape=(flops_num, combos_num))
+        offset += self.ties.nbytes
+        self.categories = np.memmap(path, dtype='<u4', mode='r', offset=offset, shape=(flops_num, categories_num))
+        offset += self.categories.nbytes
+        flops = np.fromfile(path, dtype=np.uint8, count=3 * flops_num, offset=offset).reshape(flops_num, 3)
+        self.flop_index: Dict[Tuple[int, ...], int] = {tuple(flop): index for index, flop in enumerate(flops.tolist())}
+
+    def lookup(self, pocket_codes: Sequence[int], flop_codes: Sequence[int]) -> Tuple[float, float, float]:
+        # Heads-up win, tie and loss probabilities of the pocket on the flop
+        flop, perm = canonical_flop(flop_codes)
+        first, second = ((code & ~3) | perm[code & 3] for code in pocket_codes)
+        index = self.flop_index[flop]
+        combo = COMBO_INDEX[first, second]
+        showdowns_num = comb(CARDS_NUM - 5, 2) * comb(CARDS_NUM - 7, 2)
+        win = float(self.wins[index, combo]) / showdowns_num
+        tie = float(self.ties[index, combo]) / showdowns_num
+        return win, tie, 1 - win - tie
+
+    def opponent_probs(self, pocket_codes: Sequence[int], flop_codes: Sequence[int]) -> List[float]:
+        # The stored counts include opponent hands with our cards, so the unseen 4-card sets holding
+        # one of them are evaluated and taken out
+        flop, _ = canonical_flop(flop_codes)
+        counts = self.categories[self.flop_index[flop]].astype(np.int64)
+        known = set(pocket_codes) | set(flop_codes)
+        others = np.array([code for code in range(CARDS_NUM) if code not in known], dtype=np.uint8)
+        # Sets with the first card, then sets with the second card but not the first one
+        for code, rest in ((pocket_codes[0], np.append(others, pocket_codes[1])), (pocket_codes[1], others)):
+            strengths = evaluate_strengths_array(rest[combinations_array(len(rest), 3)],
+                                                 evaluation_state(tuple(flop_codes) + (code,)))
+            counts -= np.bincount(strengths_categories(strengths), minlength=len(counts))
+        return (counts / counts.sum()).tolist()
+
+    def result_dict(self, pocket_codes: Sequence[int], flop_codes: Sequence[int]) -> dict:
+        # Heads-up flop result: only our own 1081 runouts are evaluated for my_probs
+        known = set(pocket_codes) | set(flop_codes)
+        deck = np.array([code for code in range(CARDS_NUM) if code not in known], dtype=np.uint8)
+        my_categories = strengths_categories(evaluate_strengths_array(
+            deck[combinations_array(len(deck), 2)], evaluation_state(tuple(pocket_codes) + tuple(flop_codes))))
+        win, tie, loss = self.lookup(pocket_codes, flop_codes)
+        return {'my_probs': (np.bincount(my_categories, minlength=CATEGORIES_NUM) / len(my_categories)).tolist(),
+                'opponent_probs': self.opponent_probs(pocket_codes, flop_codes),
+                'win_prob': win + tie / 2,
+                'win': win,
+                'tie': tie,
+                'loss': loss}
+
+
+def get_flop_table(path: str = FLOPS_PATH) -> Optional[FlopTable]:
+    # The table is optional: without the file, or while it is disabled, flop queries are enumerated
+    global _flop_table
+    if not _flop_table_enabled:
+        return None
+    if _flop_table is None and os.path.exists(path):
+        _flop_table = FlopTable(path)
+    return _flop_table
+
+
+def set_flop_table_enabled(enabled: bool) -> None:
+    # Benchmarks time the enumeration whether or not the table was built on this machine
+    global _flop_table_enabled
+    _flop_table_enabled = enabled
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Build the flop equity table')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=FLOPS_PATH)
+    args = parser.parse_args()
+    start = time.time()
+    with Executor(workers=args.workers) as executor:
+        flops, wins, ties, categories = build_flop_table(executor)
+    save_flop_table(flops, wins, ties, categories, args.output)
+    print('Saved {} in {:.1f}s'.format(args.output, time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,100 @@
 from .combinations import *
-from typing import List
-from collections import Counter
-import multiprocessing
+from .canonical import ResultCache, canonical_key, get_default_cache
+from .evaluator import CARDS_NUM, cards_codes, evaluate_category, evaluate_strength
+from .executor import Executor, get_default_executor
+from .preflop import preflop_equity
+from .profiling import Profiler, phase
+from collections import defaultdict
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple, Union
+import copy
+import functools
+import numbers
+
+# The showdown, range, flop table and Monte Carlo modules (and NumPy with them) are imported by the
+# methods that use them, so a pre-flop lookup does not load them
+if TYPE_CHECKING:
+    from .ranges import HandRange, RangeShowdown
+    from .showdown import RunoutShowdown
+
+STREET_METHODS = {0: 'process_pre_flop', 3: 'process_flop', 4: 'process_turn', 5: 'process_river'}
+# Keys of every street result, whichever way it is computed
+STREET_KEYS = ('my_probs', 'opponent_probs', 'win_prob')
+DEFAULT_OPPONENTS_NUM = 8
+# Below this many heads-up pockets on one board, answering them one by one is cheaper than a board pass
+MIN_SHARED_POCKETS = 8
+# Every opponent needs two of the cards left after our pocket and the full board
+MAX_OPPONENTS_NUM = (CARDS_NUM - 7) // 2
+
+
+def check_opponents_num(opponents_num: int) -> int:
+    if not isinstance(opponents_num, numbers.Integral) or isinstance(opponents_num, bool) or \
+            not 1 <= opponents_num <= MAX_OPPONENTS_NUM:
+        raise ValueError('Opponents number must be an integer from 1 to {}, got {!r}'.format(
+            MAX_OPPONENTS_NUM, opponents_num))
+    return opponents_num
+
+
+def validate_hand(pocket_codes: Sequence[int], board_codes: Sequence[int]) -> None:
+    if len(pocket_codes) != 2 or len(board_codes) not in STREET_METHODS:
+        raise ValueError('Expected 2 pocket cards and 0, 3, 4 or 5 board cards')
+    if len(set(pocket_codes) | set(board_codes)) != len(pocket_codes) + len(board_codes):
+        raise ValueError('Duplicated cards')
+
+
+def board_results(args: Tuple) -> List[dict]:
+    # Heads-up results of many pockets on one board from a single pass over every pocket
+    from .ranges import PocketsShowdown
+    board_codes, pockets_codes = args
+    showdown = PocketsShowdown.compute(board_codes)
+    return [street_dict(showdown.result_dict(pocket_codes)) for pocket_codes in pockets_codes]
+
+
+def street_dict(result_dict: dict) -> dict:
+    return {key: result_dict[key] for key in STREET_KEYS}
+
+
+def profiled(method):
+    # With a profiler set, the call is collected by its own profiler which forwards every event to the
+    # game one, and its summary is returned under the 'profile' key
+    @functools.wraps(method)
+    def wrapper(game: 'Game', *args, **kwargs):
+        if game.profiler is None:
+            return method(game, *args, **kwargs)
+        game_profiler = game.profiler
+        game.profiler = Profiler(game_profiler.record)
+        try:
+            with game.profiler.phase(method.__name__):
+                result_dict = method(game, *args, **kwargs)
+        finally:
+            call_profiler, game.profiler = game.profiler, game_profiler
+        result_dict['profile'] = call_profiler.summary()
+        return result_dict
+    return wrapper
+
+
+def cached_street(board_cards_num: int = None):
+    # Street results only depend on the suit-isomorphism class of (pocket, board) and opponents number.
+    # An opponent range is not suit-symmetric in general, so with a range the exact cards are the key.
+    # Without board_cards_num the whole table is used
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(game: 'Game'):
+            with phase(game.profiler, 'cache'):
+                board_codes = game.table.codes[:board_cards_num] if board_cards_num else game.table.codes
+                if game.opponent_range is None:
+                    key = (method.__name__, game.opp_num, canonical_key(game.pocket.codes, board_codes))
+                else:
+                    key = (method.__name__, game.opp_num, game.pocket.codes, board_codes,
+                           game.opponent_range.digest())
+                result_dict = game.cache.get(key)
+            if game.profiler is not None:
+                game.profiler.count('cache_hits' if result_dict is not None else 'cache_misses')
+            if result_dict is None:
+                result_dict = method(game)
+                game.cache.put(key, result_dict)
+            return copy.deepcopy(result_dict)
+        return wrapper
+    return decorator
 
 
 class Game(object):
@@ -26,113 +119,154 @@ class Game(object):
                           5 / 11,
                           4 / 23]
 
-    def __init__(self, pocket: Pocket, table: Table = None, opponents_num: int = 8):
+    def __init__(self, pocket: Pocket, table: Table = None, opponents_num: int = DEFAULT_OPPONENTS_NUM,
+                 executor: Executor = None, cache: ResultCache = None, profiler: Profiler = None,
+                 opponent_range: 'HandRange' = None):
         self.pocket = pocket
         self.table = Table() if table is None else table
         self.deck = None
         self.sync_deck()
-        self.opp_num = opponents_num
+        self.opp_num = check_opponents_num(opponents_num)
+        self.showdown = None
+        self.showdown_board = None
+        self.executor = get_default_executor() if executor is None else executor
+        self.cache = get_default_cache() if cache is None else cache
+        self.profiler = profiler
+        # Opponents hold hands from this range on the flop and later streets instead of any two cards
+        self.opponent_range = opponent_range
 
+    @profiled
     def process_pre_flop(self):
         my_probs = list()
-        for func in self.pre_flop_functions:
-            try:
-                my_probs.append(func(self.pocket) / self.pre_flop_combinations)
-            except TypeError:
-                my_probs.append(None)
+        with phase(self.profiler, 'pre_flop.combinations'):
+            for func in self.pre_flop_functions:
+                try:
+                    my_probs.append(func(self.pocket) / self.pre_flop_combinations)
+                except TypeError:
+                    my_probs.append(None)
         if my_probs[-1] is None:
             my_probs[-1] = 1 - sum(my_probs[:-1])
             my_probs.append(0)
         else:
             my_probs.append(1 - sum(my_probs))
+        with phase(self.profiler, 'pre_flop.table'):
+            win_prob = preflop_equity(self.pocket.codes, self.opp_num)
         result_dict = {'my_probs': my_probs,
                        'opponent_probs': self.pre_flop_opp_probs,
-                       'win_prob': Game.compute_win_prob(my_probs, self.pre_flop_opp_probs)}
+                       'win_prob': win_prob}
         return result_dict
 
+    @profiled
+    @cached_street(3)
     def process_flop(self):
-        my_combinations_lst = self.deck.get_combinations(2)
-        my_combinations_sz = len(my_combinations_lst)
-        with multiprocessing.Pool(processes=4) as pool:
-            my_results = pool.map(Game.get_combination,
-                                  map(lambda x: x + self.table.cards[:3] + self.pocket.cards, my_combinations_lst))
-        my_count = Counter(my_results)
-        my_probs = [my_count[i] for i in range(10)]
-        my_probs = list(map(lambda x: x / my_combinations_sz, my_probs))
-
-        opp_combinations_lst = self.deck.get_combinations(4)
-        opp_combinations_sz = len(opp_combinations_lst)
-
-        with multiprocessing.Pool(processes=4) as pool:
-            opp_results = pool.map(Game.get_combination,
-                                   map(lambda x: x + self.table.cards[:3], opp_combinations_lst),
-                                   128)
-        opp_count = Counter(opp_results)
-        opp_probs = [opp_count[i] for i in range(10)]
-        opp_probs = list(map(lambda x: x / opp_combinations_sz, opp_probs))
-
-        result_dict = {'my_probs': my_probs,
-                       'opponent_probs': opp_probs,
-                       'win_prob': Game.compute_win_prob(my_probs, opp_probs)}
-        return result_dict
+        return self.street_result(3)
 
+    @profiled
+    @cached_street(4)
     def process_turn(self):
-        my_combinations_lst = self.deck.get_combinations(1)
-        my_combinations_sz = len(my_combinations_lst)
-        my_probs = [0] * 10
-        for comb in my_combinations_lst:
-            local_table = self.table.add_river(comb[0], inplace=False)
-            combination_idx = Game.get_combination(self.pocket.cards + local_table.cards)
-            my_probs[combination_idx] += 1
-        my_probs = list(map(lambda x: x / my_combinations_sz, my_probs))
-
-        opp_combinations_lst = self.deck.get_combinations(3)
-        opp_combinations_sz = len(opp_combinations_lst)
-        with multiprocessing.Pool(processes=4) as pool:
-            opp_results = pool.map(Game.get_combination,
-                                   map(lambda x: x + self.table.cards[:4], opp_combinations_lst))
-        opp_count = Counter(opp_results)
-        opp_probs = [opp_count[i] for i in range(10)]
-        opp_probs = list(map(lambda x: x / opp_combinations_sz, opp_probs))
+        return self.street_result(4)
 
-        result_dict = {'my_probs': my_probs,
-                       'opponent_probs': opp_probs,
-                       'win_prob': Game.compute_win_prob(my_probs, opp_probs)}
+    @profiled
+    @cached_street(5)
+    def process_river(self):
+        return self.street_result(5)
+
+    @profiled
+    @cached_street()
+    def process_heads_up(self):
+        # Exact showdown against one opponent on the current street, with win, tie and loss separately
+        board_cards_num = len(self.table.codes)
+        if board_cards_num < 3:
+            raise ValueError('Exact heads-up enumeration starts on the flop, use process_pre_flop before it')
+        result_dict = self.flop_table_result(board_cards_num)
+        if result_dict is not None:
+            return result_dict
+        showdown = self.compute_showdown(board_cards_num, card_counts=False)
+        with phase(self.profiler, 'equity'):
+            result_dict = showdown.result_dict(1)
+            result_dict['win'], result_dict['tie'], result_dict['loss'] = showdown.probs()
         return result_dict
 
-    def process_river(self):
-        my_probs = [0] * 10
-        combination_idx = Game.get_combination(self.pocket.cards + self.table.cards)
-        my_probs[combination_idx] += 1
-
-        opp_combinations_lst = self.deck.get_combinations(2)
-        opp_combinations_sz = len(opp_combinations_lst)
-        opp_probs = [0] * 10
-        for comb in opp_combinations_lst:
-            local_pocket = Pocket(comb)
-            combination_idx = Game.get_combination(local_pocket.cards + self.table.cards)
-            opp_probs[combination_idx] += 1
-        opp_probs = list(map(lambda x: x / opp_combinations_sz, opp_probs))
+    @profiled
+    @cached_street()
+    def process_potential(self):
+        # Heads-up hand strength on the current board, its potential and the distribution of the river
+        # strength over the remaining runouts, against any two cards
+        board_codes = self.table.codes
+        if len(board_codes) < 3:
+            raise ValueError('Hand potential is computed from the flop on')
+        if self.opponent_range is not None:
+            raise ValueError('Hand potential is computed against any two cards, not against an opponent range')
+        from .showdown import RunoutShowdown
+        showdown = RunoutShowdown.compute(self.pocket.codes, board_codes, self.executor, self.profiler,
+                                          card_counts=False, potential=True)
+        with phase(self.profiler, 'equity'):
+            return showdown.potential_dict()
 
-        result_dict = {'my_probs': my_probs,
-                       'opponent_probs': opp_probs,
-                       'win_prob': Game.compute_win_prob(my_probs, opp_probs)}
+    def street_result(self, board_cards_num: int) -> dict:
+        result_dict = self.flop_table_result(board_cards_num) if self.opp_num <= 1 else None
+        if result_dict is not None:
+            return street_dict(result_dict)
+        showdown = self.compute_showdown(board_cards_num)
+        with phase(self.profiler, 'equity'):
+            return showdown.result_dict(self.opp_num)
+
+    def flop_table_result(self, board_cards_num: int) -> Optional[dict]:
+        # Heads-up flops against any two cards are looked up in the prebuilt flop table when it exists
+        if board_cards_num != 3 or self.opponent_range is not None:
+            return None
+        from .flops import get_flop_table
+        flop_table = get_flop_table()
+        if flop_table is None:
+            return None
+        with phase(self.profiler, 'flop_table'):
+            return flop_table.result_dict(self.pocket.codes, self.table.codes[:3])
+
+    def compute_showdown(self, board_cards_num: int,
+                         card_counts: bool = True) -> Union['RunoutShowdown', 'RangeShowdown']:
+        # Per-runout results of an earlier street already cover every later board, so they are filtered
+        # instead of being evaluated again. Per-card counts are only needed against several opponents
+        from .ranges import HandRange, RangeShowdown
+        from .showdown import RunoutShowdown
+        board_codes = self.table.codes[:board_cards_num]
+        card_counts = card_counts and self.opp_num > 1
+        reusable = self.showdown_board is not None and board_codes[:len(self.showdown_board)] == self.showdown_board
+        if reusable and (self.opponent_range is not None or self.showdown.has_card_counts or not card_counts):
+            with phase(self.profiler, 'showdown.restrict'):
+                return self.showdown.restrict(board_codes[len(self.showdown_board):])
+        if self.opponent_range is not None:
+            with phase(self.profiler, 'showdown.range'):
+                self.showdown = RangeShowdown.compute(HandRange.from_pocket(self.pocket.codes), self.opponent_range,
+                                                      board_codes)
+        else:
+            self.showdown = RunoutShowdown.compute(self.pocket.codes, board_codes, self.executor, self.profiler,
+                                                   card_counts)
+        self.showdown_board = board_codes
+        return self.showdown
+
+    @profiled
+    def process_monte_carlo(self, target_stderr: float = 0.005, time_budget: float = None, seed: int = None):
+        from .monte_carlo import MonteCarloEquity
+        engine = MonteCarloEquity(self.executor, seed)
+        result_dict = engine.estimate(self.pocket.codes, self.table.codes, self.opp_num, target_stderr, time_budget)
+        if self.profiler is not None:
+            self.profiler.count('hands_evaluated', result_dict['samples'] * (max(self.opp_num, 1) + 1))
         return result_dict
 
     def open_flop(self, cards: List[Card]):
         self.table.add_flop(cards)
-        self.sync_deck()
+        self.deck.get_cards(set(cards))
 
     def open_turn(self, card: Card):
         self.table.add_turn(card)
-        self.sync_deck()
+        self.deck.get_cards({card})
 
     def open_river(self, card: Card):
         self.table.add_river(card)
-        self.sync_deck()
+        self.deck.get_cards({card})
 
     def sync_deck(self):
-        self.deck = Deck()
+        self.deck = BitDeck()
         self.deck.get_cards(set(self.pocket.cards))
         self.deck.get_cards(set(self.table.cards))
 
@@ -143,27 +277,59 @@ class Game(object):
             win_prob += my_probs[cmb_idx] * (sum(oponent_probs[cmb_idx + 1:]) + 0.5 * oponent_probs[cmb_idx])
         return win_prob
 
+    @staticmethod
+    def process_many(queries: Sequence[tuple], executor: Executor = None, cache: ResultCache = None) -> List[dict]:
+        # Results of many (pocket, table[, opponents_num]) queries in their order, shaped and cached like
+        # the street methods of a Game with the same arguments. Uncached heads-up queries on a board
+        # shared by enough of them come from one board pass, run for distinct boards in parallel; the
+        # rest are processed by their own Game
+        executor = get_default_executor() if executor is None else executor
+        cache = get_default_cache() if cache is None else cache
+        results = [None] * len(queries)
+        keys = [None] * len(queries)
+        boards = defaultdict(list)
+        singles = list()
+        for query_idx, query in enumerate(queries):
+            pocket, table = query[:2]
+            opponents_num = check_opponents_num(query[2] if len(query) > 2 else DEFAULT_OPPONENTS_NUM)
+            if len(table.codes) >= 3 and opponents_num == 1:
+                # The same key as cached_street uses for this street
+                keys[query_idx] = (STREET_METHODS[len(table.codes)], opponents_num,
+                                   canonical_key(pocket.codes, table.codes))
+                results[query_idx] = cache.get(keys[query_idx])
+                if results[query_idx] is None:
+                    boards[table.codes].append(query_idx)
+                else:
+                    results[query_idx] = copy.deepcopy(results[query_idx])
+            else:
+                singles.append(query_idx)
+        shared = list()
+        for board_codes, query_ids in boards.items():
+            if len(query_ids) >= MIN_SHARED_POCKETS:
+                shared.append((board_codes, query_ids))
+            else:
+                singles.extend(query_ids)
+
+        tasks = [(board_codes, [queries[query_idx][0].codes for query_idx in query_ids])
+                 for board_codes, query_ids in shared]
+        for (_, query_ids), board_dicts in zip(shared, executor.imap(board_results, tasks)):
+            for query_idx, result_dict in zip(query_ids, board_dicts):
+                cache.put(keys[query_idx], result_dict)
+                results[query_idx] = copy.deepcopy(result_dict)
+        for query_idx in sorted(singles):
+            pocket, table = queries[query_idx][:2]
+            opponents_num = queries[query_idx][2] if len(queries[query_idx]) > 2 else DEFAULT_OPPONENTS_NUM
+            game = Game(pocket, table, opponents_num, executor, cache)
+            results[query_idx] = getattr(game, STREET_METHODS[len(table.codes)])()
+        return results
+
+    @staticmethod
+    def get_strength(all_cards: List[Card]):
+        return evaluate_strength(cards_codes(all_cards))
+
     @staticmethod
     def get_combination(all_cards: List[Card]):
-        if has_royal_flush(all_cards=all_cards):
-            return 0
-        elif has_straight_flush(all_cards=all_cards):
-            return 1
-        elif has_four_of_a_kind(all_cards=all_cards):
-            return 2
-        elif has_full_house(all_cards=all_cards):
-            return 3
-        elif has_flush(all_cards=all_cards):
-            return 4
-        elif has_straight(all_cards=all_cards):
-            return 5
-        elif has_three_of_a_kind(all_cards=all_cards):
-            return 6
-        elif has_two_pair(all_cards=all_cards):
-            return 7
-        elif has_pair(all_cards=all_cards):
-            return 8
-        return 9
+        return evaluate_category(cards_codes(all_cards))
 
     @staticmethod
     def start():
@@ -174,7 +340,8 @@ class Game(object):
         suit2 = int(input('Card 2, suit : '))
         pocket = Pocket([Card(val1, suit1),
                          Card(val2, suit2)])
-        game_obj = Game(pocket, opponents_num=0)
+        opponents_num = int(input('Opponents number : '))
+        game_obj = Game(pocket, opponents_num=opponents_num)
         print('--- Pre-flop ---')
         res = game_obj.process_pre_flop()
         print('Win prob: {:.2f}%'.format(100 * res['win_prob']))
@@ -0,0 +1,83 @@
+from typing import Sequence, Tuple
+import math
+import time
+
+import numpy as np
+
+from .evaluator import CARDS_NUM
+from .executor import Executor, get_default_executor
+from .vectorized import evaluate_strengths_array, evaluation_state
+
+Z_95 = 1.959963984540054
+# Samples per worker in the first round of a timed estimate, which measures the sampling speed
+PROBE_BATCH = 256
+
+
+def simulate_batch(args: Tuple) -> Tuple[float, float, int]:
+    # One batch of random deals; returns sum and sum of squares of our pot share and samples number
+    pocket_codes, board_codes, opponents_num, batch_size, seed = args
+    rng = np.random.default_rng(np.random.SeedSequence(seed[0], spawn_key=seed[1:]))
+    known = set(pocket_codes) | set(board_codes)
+    deck = np.array([code for code in range(CARDS_NUM) if code not in known], dtype=np.uint8)
+    runout_size = 5 - len(board_codes)
+    dealt = deck[rng.random((batch_size, len(deck))).argsort(axis=1)[:, :runout_size + 2 * opponents_num]]
+    # The known board is folded in once; hands only add the dealt runout and their pocket
+    board_state = evaluation_state(board_codes)
+    runouts = dealt[:, :runout_size]
+    my_strengths = evaluate_strengths_array(runouts, evaluation_state(pocket_codes, board_state))
+    best = np.full(batch_size, -1)
+    best_num = np.zeros(batch_size)
+    for opp_idx in range(opponents_num):
+        opp_pockets = dealt[:, runout_size + 2 * opp_idx:runout_size + 2 * opp_idx + 2]
+        opp_strengths = evaluate_strengths_array(np.hstack([opp_pockets, runouts]), board_state)
+        best_num = np.where(opp_strengths > best, 1, best_num + (opp_strengths == best))
+        best = np.maximum(best, opp_strengths)
+    shares = np.where(my_strengths > best, 1., np.where(my_strengths == best, 1 / (best_num + 1), 0.))
+    return float(shares.sum()), float((shares * shares).sum()), batch_size
+
+
+class MonteCarloEquity(object):
+
+    def __init__(self, executor: Executor = None, seed: int = None, batch_size: int = 4096) -> None:
+        self.executor = get_default_executor() if executor is None else executor
+        self.seed = np.random.SeedSequence().entropy if seed is None else seed
+        self.batch_size = batch_size
+
+    def estimate(self, pocket_codes: Sequence[int], board_codes: Sequence[int] = (), opponents_num: int = 1,
+                 target_stderr: float = 0.005, time_budget: float = None, max_samples: int = 10 ** 7) -> dict:
+        # Runs rounds of one batch per worker until the standard error of win_prob reaches target_stderr,
+        # the next round would overrun time_budget (seconds) or max_samples is reached. With a budget the
+        # first round is a PROBE_BATCH probe, so a short budget is not overrun by a full first round, and
+        # later rounds are checked against the measured time per sample. Worker w draws round r from the
+        # stream (seed, w, r), so results only depend on seed, workers, batch size and whether a budget is set
+        if time_budget is not None and time_budget <= 0:
+            raise ValueError('time_budget must be positive')
+        start = time.perf_counter()
+        opponents_num = max(opponents_num, 1)
+        total = total_sq = 0.
+        samples = rounds = 0
+        stderr = math.inf
+        while True:
+            batch_size = min(PROBE_BATCH, self.batch_size) if time_budget is not None and not rounds else \
+                self.batch_size
+            tasks = [(tuple(pocket_codes), tuple(board_codes), opponents_num, batch_size,
+                      (self.seed, worker, rounds)) for worker in range(self.executor.workers)]
+            for batch_total, batch_total_sq, batch_samples in self.executor.map(simulate_batch, tasks):
+                total += batch_total
+                total_sq += batch_total_sq
+                samples += batch_samples
+            rounds += 1
+            mean = total / samples
+            stderr = math.sqrt(max(total_sq / samples - mean * mean, 0.) / (samples - 1))
+            elapsed = time.perf_counter() - start
+            if stderr <= target_stderr or samples >= max_samples:
+                break
+            if time_budget is not None and \
+                    elapsed * (1 + self.batch_size * self.executor.workers / samples) > time_budget:
+                break
+        return {'win_prob': mean,
+                'stderr': stderr,
+                'confidence_interval': (max(mean - Z_95 * stderr, 0.), min(mean + Z_95 * stderr, 1.)),
+                'samples': samples,
+                'converged': stderr <= target_stderr,
+                'elapsed': time.perf_counter() - start}
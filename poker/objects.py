@@ -1,11 +1,17 @@
 from itertools import combinations
-from typing import List, Set
-import copy
+from math import comb
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from .ranking import rank_combination, unrank_combination
 
 __package__ = 'poker.objects'
 
 
 class Card(object):
+    # Cards are interned: Card(val, suit) always returns one of 52 shared instances, which also carry
+    # their 0..51 code ((val - 2) << 2 | suit) and rank/suit bits for the evaluator
+    __slots__ = ('val', 'suit', 'code', 'rank_bit', 'suit_bit')
+
     VALUES = {'2': 2,
               '3': 3,
               '4': 4,
@@ -30,9 +36,38 @@ class Card(object):
                 'h': 2,
                 's': 3}
 
-    def __init__(self, val: int, suit: int) -> None:
-        self.val = val
-        self.suit = suit
+    def __new__(cls, val: int, suit: int) -> 'Card':
+        card = _interned_cards.get((val, suit))
+        if card is None:
+            if val not in range(2, 15) or suit not in range(4):
+                raise ValueError('Invalid card val:{}, suit:{}'.format(val, suit))
+            card = super().__new__(cls)
+            card.val = val
+            card.suit = suit
+            card.code = ((val - 2) << 2) | suit
+            card.rank_bit = 1 << (val - 2)
+            card.suit_bit = 1 << suit
+            _interned_cards[(val, suit)] = card
+        return card
+
+    @staticmethod
+    def from_str(text: str) -> 'Card':
+        # Short notation: value then suit letter, e.g. 'Qd', '10h' or 'Th'
+        text = text.strip()
+        val = Card.VALUES.get('10' if text[:-1].upper() == 'T' else text[:-1].upper())
+        suit = Card.SUITS_SH.get(text[-1:].lower())
+        if val is None or suit is None:
+            raise ValueError('Invalid card `{}`'.format(text))
+        return Card(val, suit)
+
+    def __reduce__(self):
+        return Card, (self.val, self.suit)
+
+    def __copy__(self) -> 'Card':
+        return self
+
+    def __deepcopy__(self, memo: dict) -> 'Card':
+        return self
 
     def __hash__(self) -> int:
         return 100 * self.suit + self.val
@@ -60,73 +95,222 @@ class Card(object):
         return self.val == other.val - 1
 
 
+_interned_cards: Dict[Tuple[int, int], Card] = dict()
+ALL_CARDS = tuple(Card(val, suit) for suit in range(4) for val in range(2, 15))
+ALL_CARDS_BY_CODE = tuple(sorted(ALL_CARDS, key=lambda card: card.code))
+
+
+def parse_cards(cards: Union[str, Sequence[str]]) -> List[Card]:
+    # Cards in short notation (Qd, 10h or Th), as one space or comma separated string or a sequence of them
+    if not isinstance(cards, str):
+        cards = ' '.join(cards)
+    return [Card.from_str(text) for text in cards.replace(',', ' ').split()]
+
+
+def _codes_of(cards: Iterable[Card]) -> Tuple[Optional[int], ...]:
+    return tuple(None if card is None else card.code for card in cards)
+
+
+def _cards_of(codes: Iterable[Optional[int]]) -> Tuple[Card, ...]:
+    return tuple(None if code is None else ALL_CARDS_BY_CODE[code] for code in codes)
+
+
 class Pocket(object):
+    # Cards are kept as a tuple of codes (None for an unknown card) and looked up on access. The cards
+    # come back as a tuple: they change only by assigning all of them
+    __slots__ = ('card_codes',)
 
     def __init__(self, cards: List[Card] = None) -> None:
-        if not cards:
-            self.cards = [None] * 2
-        else:
-            self.cards = cards
+        self.cards = cards if cards else [None] * 2
+
+    @property
+    def cards(self) -> Tuple[Card, ...]:
+        return _cards_of(self.card_codes)
+
+    @cards.setter
+    def cards(self, cards: List[Card]) -> None:
+        self.card_codes = _codes_of(cards)
+
+    @property
+    def codes(self) -> Tuple[int, ...]:
+        return tuple(code for code in self.card_codes if code is not None)
 
 
 class Table(object):
+    # Five board slots kept as a tuple of codes, None for cards not dealt yet. The cards come back as a
+    # tuple: they change through add_flop, add_turn and add_river or by assigning all of them
+    __slots__ = ('card_codes',)
 
     # noinspection PyTypeChecker
     def __init__(self, cards: List[Card] = None) -> None:
         if not cards:
             self.cards = [None] * 5
         elif len(cards) <= 5:
-            self.cards = cards + [None] * (5 - len(cards))
+            self.cards = list(cards) + [None] * (5 - len(cards))
         else:
             raise Exception('Can`t be more than 5 cards on the table')
 
+    @property
+    def cards(self) -> Tuple[Card, ...]:
+        return _cards_of(self.card_codes)
+
+    @cards.setter
+    def cards(self, cards: List[Card]) -> None:
+        self.card_codes = _codes_of(cards)
+
+    def _with_card_codes(self, position: int, codes: Tuple[Optional[int], ...]) -> Tuple[Optional[int], ...]:
+        return self.card_codes[:position] + codes + self.card_codes[position + len(codes):]
+
     def add_flop(self, cards: List[Card], inplace: bool = True):
         assert len(cards) == 3
         if inplace:
-            self.cards[:3] = cards
+            self.card_codes = self._with_card_codes(0, _codes_of(cards))
         else:
             return Table(cards)
 
     def add_turn(self, card: Card, inplace: bool = True):
-        if inplace:
-            self.cards[3] = card
-        else:
-            copy_cards = copy.deepcopy(self.cards)
-            copy_cards[3] = card
-            return Table(copy_cards)
+        return self._add_card(3, card, inplace)
 
     def add_river(self, card: Card, inplace: bool = True):
+        return self._add_card(4, card, inplace)
+
+    def _add_card(self, position: int, card: Card, inplace: bool):
+        card_codes = self._with_card_codes(position, (card.code,))
         if inplace:
-            self.cards[4] = card
+            self.card_codes = card_codes
         else:
-            copy_cards = copy.deepcopy(self.cards)
-            copy_cards[4] = card
-            return Table(copy_cards)
+            table = Table.__new__(Table)
+            table.card_codes = card_codes
+            return table
+
+    @property
+    def codes(self) -> Tuple[int, ...]:
+        return tuple(code for code in self.card_codes if code is not None)
 
 
 class Deck(object):
+    # The cards left, kept as a set of codes
+    __slots__ = ('card_codes',)
 
     def __init__(self, cards: Set[Card] = None):
-        if cards is None:
-            self.cards = set()
-            for suit in range(4):
-                for val in range(2, 15):
-                    self.cards.add(Card(val, suit))
-        else:
-            self.cards = cards
+        self.card_codes = set(range(len(ALL_CARDS))) if cards is None else {card.code for card in cards}
+
+    @property
+    def cards(self) -> FrozenSet[Card]:
+        # A snapshot: the deck changes only through get_card_by_obj, get_card_by_sv and get_cards
+        return frozenset(ALL_CARDS_BY_CODE[code] for code in self.card_codes)
+
+    @property
+    def codes(self) -> Tuple[int, ...]:
+        return tuple(sorted(self.card_codes))
 
     def get_card_by_obj(self, card: Card):
-        self.cards -= card
+        self.card_codes.discard(card.code)
         return card
 
     def get_card_by_sv(self, val: int, suit: int):
-        card = Card(val, suit)
-        self.cards -= card
+        return self.get_card_by_obj(Card(val, suit))
+
+    def get_cards(self, cards: Set[Card]):
+        self.card_codes -= {card.code for card in cards if card is not None}
+        return cards
+
+    def get_combinations(self, size) -> List[List[Card]]:
+        return [list(_cards_of(subset)) for subset in combinations(self.codes, size)]
+
+
+class BitDeck(object):
+    # Deck kept as a 52-bit mask over card codes, with the same interface as Deck
+    FULL_MASK = (1 << 52) - 1
+
+    def __init__(self, cards: Set[Card] = None):
+        self.mask = BitDeck.FULL_MASK if cards is None else BitDeck.cards_mask(cards)
+
+    @staticmethod
+    def from_mask(mask: int) -> 'BitDeck':
+        deck = BitDeck.__new__(BitDeck)
+        deck.mask = mask
+        return deck
+
+    @staticmethod
+    def cards_mask(cards: Iterable[Card]) -> int:
+        mask = 0
+        for card in cards:
+            if card is not None:
+                mask |= 1 << card.code
+        return mask
+
+    def __len__(self) -> int:
+        return bin(self.mask).count('1')
+
+    def __contains__(self, card: Card) -> bool:
+        return bool(self.mask >> card.code & 1)
+
+    @property
+    def codes(self) -> Tuple[int, ...]:
+        codes = []
+        mask = self.mask
+        while mask:
+            low_bit = mask & -mask
+            codes.append(low_bit.bit_length() - 1)
+            mask ^= low_bit
+        return tuple(codes)
+
+    @property
+    def cards(self) -> FrozenSet[Card]:
+        # A snapshot: the deck changes only through get_card_by_obj, get_card_by_sv and get_cards
+        return frozenset(ALL_CARDS_BY_CODE[code] for code in self.codes)
+
+    def get_card_by_obj(self, card: Card):
+        self.mask &= ~(1 << card.code)
         return card
 
+    def get_card_by_sv(self, val: int, suit: int):
+        return self.get_card_by_obj(Card(val, suit))
+
     def get_cards(self, cards: Set[Card]):
-        self.cards -= cards
+        self.mask &= ~BitDeck.cards_mask(cards)
         return cards
 
+    def iter_masks(self, size: int, start: int = 0, stop: int = None) -> Iterator[int]:
+        # Masks of the size-subsets with lexicographic indices in [start, stop), the same order as
+        # get_combination and get_combination_index, so an index range is a contiguous piece of the
+        # enumeration. The first subset is unranked, each next one bumps the rightmost position that can move
+        codes = self.codes
+        if size > len(codes):
+            return
+        stop = comb(len(codes), size) if stop is None else min(stop, comb(len(codes), size))
+        if start >= stop:
+            return
+        positions = list(unrank_combination(start, len(codes), size))
+        for _ in range(start, stop):
+            mask = 0
+            for position in positions:
+                mask |= 1 << codes[position]
+            yield mask
+            i = size - 1
+            while i >= 0 and positions[i] == len(codes) - size + i:
+                i -= 1
+            if i < 0:
+                return
+            positions[i] += 1
+            for j in range(i + 1, size):
+                positions[j] = positions[j - 1] + 1
+
+    def iter_combinations(self, size, start: int = 0, stop: int = None) -> Iterator[List[Card]]:
+        for mask in self.iter_masks(size, start, stop):
+            yield [ALL_CARDS_BY_CODE[code] for code in BitDeck.from_mask(mask).codes]
+
     def get_combinations(self, size) -> List[List[Card]]:
-        return [list(comb) for comb in combinations(self.cards, size)]
+        return list(self.iter_combinations(size))
+
+    def get_combination(self, index: int, size: int) -> List[Card]:
+        # index-th size-subset of the deck in lexicographic code order, so a range of indices
+        # describes a piece of the enumeration that can be regenerated anywhere
+        codes = self.codes
+        return [ALL_CARDS_BY_CODE[codes[position]] for position in unrank_combination(index, len(codes), size)]
+
+    def get_combination_index(self, cards: Iterable[Card]) -> int:
+        codes = self.codes
+        positions = sorted(codes.index(card.code) for card in cards)
+        return rank_combination(positions, len(codes))
@@ -0,0 +1,124 @@
+from array import array
+from typing import TYPE_CHECKING, List, Sequence, Tuple
+import argparse
+import os
+import struct
+import sys
+import time
+
+from .evaluator import RANKS_NUM, CARDS_NUM
+from .executor import Executor
+
+if TYPE_CHECKING:
+    import numpy as np
+
+STARTING_HANDS_NUM = RANKS_NUM * RANKS_NUM
+# Every opponent count a full deck can seat, like game_stages.MAX_OPPONENTS_NUM
+MAX_OPPONENTS = (CARDS_NUM - 7) // 2
+
+# Header: magic, format version, hands number, max opponents number, samples per hand
+_MAGIC = b'PKEQ'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHHHxxI')
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'preflop_equity.bin')
+
+_table = None
+
+
+def starting_hand_index(codes: Sequence[int]) -> int:
+    # 13x13 grid: pairs on the diagonal, suited hands above it, offsuit hands below it
+    high, low = max(codes[0] >> 2, codes[1] >> 2), min(codes[0] >> 2, codes[1] >> 2)
+    if (codes[0] & 3) == (codes[1] & 3):
+        return high * RANKS_NUM + low
+    return low * RANKS_NUM + high
+
+
+def starting_hand_codes(index: int) -> List[int]:
+    first, second = divmod(index, RANKS_NUM)
+    if first > second:
+        return [first << 2, second << 2]
+    return [second << 2, (first << 2) | 1]
+
+
+def load_table(path: str = TABLE_PATH) -> List[Tuple[float, ...]]:
+    # Rows of equities against 1..n opponents by starting hand. Read without NumPy: the table is small,
+    # and the pre-flop lookup is the first thing a new session does
+    with open(path, 'rb') as table_file:
+        magic, version, hands_num, opponents_num, _ = _HEADER.unpack(table_file.read(_HEADER.size))
+        values = array('f')
+        values.frombytes(table_file.read())
+    if magic != _MAGIC or version != _VERSION or len(values) != hands_num * opponents_num:
+        raise ValueError('{} is not a pre-flop equity table of version {}'.format(path, _VERSION))
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return [tuple(values[start:start + opponents_num]) for start in range(0, len(values), opponents_num)]
+
+
+def save_table(table: 'np.ndarray', samples: int, path: str = TABLE_PATH) -> None:
+    import numpy as np
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as table_file:
+        table_file.write(_HEADER.pack(_MAGIC, _VERSION, table.shape[0], table.shape[1], samples))
+        table_file.write(np.ascontiguousarray(table, dtype='<f4').tobytes())
+
+
+def preflop_equity(codes: Sequence[int], opponents_num: int) -> float:
+    global _table
+    if _table is None:
+        _table = load_table()
+    if not 1 <= opponents_num <= len(_table[0]):
+        raise ValueError('The pre-flop table covers 1 to {} opponents, got {}'.format(len(_table[0]), opponents_num))
+    return _table[starting_hand_index(codes)][opponents_num - 1]
+
+
+def simulate_hand_equities(args) -> 'np.ndarray':
+    # Equity of one starting hand against 1..MAX_OPPONENTS random hands; every sample deals
+    # MAX_OPPONENTS opponents and the first n of them are used for the n-opponent estimate
+    import numpy as np
+    from .vectorized import evaluate_strengths_array
+    index, samples, seed = args
+    pocket = starting_hand_codes(index)
+    deck = np.array([code for code in range(CARDS_NUM) if code not in pocket], dtype=np.uint8)
+    rng = np.random.default_rng([seed, index])
+    equities = np.zeros(MAX_OPPONENTS)
+    batch_size = 10000
+    for start in range(0, samples, batch_size):
+        batch = min(batch_size, samples - start)
+        dealt = deck[rng.random((batch, len(deck))).argsort(axis=1)[:, :5 + 2 * MAX_OPPONENTS]]
+        board = dealt[:, :5]
+        my_strengths = evaluate_strengths_array(np.hstack([np.broadcast_to(pocket, (batch, 2)), board]))
+        best = np.full(batch, -1)
+        best_num = np.zeros(batch)
+        for opp_idx in range(MAX_OPPONENTS):
+            opp_strengths = evaluate_strengths_array(np.hstack([dealt[:, 5 + 2 * opp_idx:7 + 2 * opp_idx], board]))
+            best_num = np.where(opp_strengths > best, 1, best_num + (opp_strengths == best))
+            best = np.maximum(best, opp_strengths)
+            shares = np.where(my_strengths > best, 1., np.where(my_strengths == best, 1 / (best_num + 1), 0.))
+            equities[opp_idx] += shares.sum()
+    return equities / samples
+
+
+def build_table(samples: int, seed: int = 0, executor: Executor = None) -> 'np.ndarray':
+    import numpy as np
+    if executor is None:
+        executor = Executor()
+    tasks = [(index, samples, seed) for index in range(STARTING_HANDS_NUM)]
+    return np.array(executor.map(simulate_hand_equities, tasks), dtype=np.float32)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Build the pre-flop equity table')
+    parser.add_argument('--samples', type=int, default=100000, help='Monte Carlo deals per starting hand')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=TABLE_PATH)
+    args = parser.parse_args()
+    start = time.time()
+    with Executor(workers=args.workers) as executor:
+        table = build_table(args.samples, args.seed, executor)
+    save_table(table, args.samples, args.output)
+    print('Saved {} in {:.1f}s'.format(args.output, time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Callable, ContextManager, Iterator
+import time
+
+# Sink signature: sink(kind, name, value) with kind 'timer' (value in seconds) or 'counter'
+Sink = Callable[[str, str, float], None]
+
+_NULL_PHASE = nullcontext()
+
+
+class Profiler(object):
+    # Accumulates per-phase wall time and event counters and forwards every event to an optional sink.
+    # Profiler.record is a sink itself, so a profiler can collect one call and pass it on to a parent
+
+    def __init__(self, sink: Sink = None) -> None:
+        self.sink = sink
+        self.timers = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+
+    def record(self, kind: str, name: str, value: float) -> None:
+        if kind == 'timer':
+            self.timers[name] += value
+            self.calls[name] += 1
+        else:
+            self.counters[name] += value
+        if self.sink is not None:
+            self.sink(kind, name, value)
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.record('counter', name, value)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record('timer', name, time.perf_counter() - start)
+
+    def summary(self) -> dict:
+        return {'timers': {name: {'seconds': seconds, 'calls': self.calls[name]}
+                           for name, seconds in self.timers.items()},
+                'counters': dict(self.counters)}
+
+    def reset(self) -> None:
+        self.timers.clear()
+        self.calls.clear()
+        self.counters.clear()
+
+
+def phase(profiler: Profiler, name: str) -> ContextManager:
+    # Disabled profiling costs one comparison and a shared no-op context manager
+    return _NULL_PHASE if profiler is None else profiler.phase(name)
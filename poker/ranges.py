@@ -0,0 +1,384 @@
+from math import comb
+from typing import Dict, Iterable, List, Sequence, Tuple
+import hashlib
+
+import numpy as np
+
+from .evaluator import CARDS_NUM, RANKS_NUM, SUITS_NUM
+from .objects import Card
+from .showdown import CATEGORIES_NUM
+from .vectorized import combinations_array, evaluate_strengths_array, evaluation_state, strengths_categories
+
+COMBOS_NUM = comb(CARDS_NUM, 2)
+# COMBOS[i] is the i-th two-card combo (lower code first), COMBO_INDEX[a, b] its index
+COMBOS = combinations_array(CARDS_NUM, 2)
+COMBO_INDEX = np.full((CARDS_NUM, CARDS_NUM), -1, dtype=np.int32)
+COMBO_INDEX[COMBOS[:, 0], COMBOS[:, 1]] = COMBO_INDEX[COMBOS[:, 1], COMBOS[:, 0]] = np.arange(COMBOS_NUM)
+RANK_CHARS = '23456789TJQKA'
+RUNOUTS_BATCH = 64
+# Strengths are below 1 << 25, so adding row * _ROW_OFFSET keeps the rows apart in one sorted array
+_ROW_OFFSET = 1 << 25
+
+
+def _class_combos(high: int, low: int, kind: str) -> List[int]:
+    # Combos of a hand class given by ranks (0..12) and kind 's' (suited), 'o' (offsuit) or '' (both)
+    combos = list()
+    for suit1 in range(SUITS_NUM):
+        for suit2 in range(SUITS_NUM):
+            first, second = (high << 2) | suit1, (low << 2) | suit2
+            if first == second or (kind == 's' and suit1 != suit2) or (kind == 'o' and suit1 == suit2):
+                continue
+            combos.append(int(COMBO_INDEX[first, second]))
+    return sorted(set(combos))
+
+
+def _parse_class(text: str) -> Tuple[int, int, str]:
+    if len(text) not in (2, 3) or text[0] not in RANK_CHARS or text[1] not in RANK_CHARS:
+        raise ValueError('Invalid hand class `{}`'.format(text))
+    high, low = sorted((RANK_CHARS.index(text[0]), RANK_CHARS.index(text[1])), reverse=True)
+    kind = text[2:].lower()
+    if kind not in ('', 's', 'o') or (high == low and kind):
+        raise ValueError('Invalid hand class `{}`'.format(text))
+    return high, low, kind
+
+
+def _parse_token(token: str) -> List[int]:
+    if len(token) == 4 and token[1].lower() in Card.SUITS_SH and token[3].lower() in Card.SUITS_SH:
+        first, second = Card.from_str(token[:2]).code, Card.from_str(token[2:]).code
+        if first == second:
+            raise ValueError('Invalid combo `{}`'.format(token))
+        return [int(COMBO_INDEX[first, second])]
+    if '-' in token:
+        # 'QQ-99', 'AKs-ATs' (the upper rank is shared) or '98s-65s' (both ranks step together)
+        (high1, low1, kind1), (high2, low2, kind2) = (_parse_class(part) for part in token.split('-', 1))
+        if kind1 != kind2 or (high1 != high2 and high1 - low1 != high2 - low2):
+            raise ValueError('Invalid hand range `{}`'.format(token))
+        gap = high1 - low1 if high1 != high2 else None
+        lows = range(min(low1, low2), max(low1, low2) + 1)
+        return [combo for low in lows for combo in _class_combos(high1 if gap is None else low + gap, low, kind1)]
+    if token.endswith('+'):
+        # 'QQ+' is QQ..AA, 'ATs+' is ATs..AKs
+        high, low, kind = _parse_class(token[:-1])
+        if high == low:
+            return [combo for rank in range(low, RANKS_NUM) for combo in _class_combos(rank, rank, '')]
+        return [combo for rank in range(low, high) for combo in _class_combos(high, rank, kind)]
+    return _class_combos(*_parse_class(token))
+
+
+class HandRange(object):
+    # Weights of the 1326 two-card combos. Combos clashing with known cards are dropped where the
+    # range is used, so a range does not depend on the board
+
+    def __init__(self, weights: np.ndarray) -> None:
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != (COMBOS_NUM,) or (weights < 0).any():
+            raise ValueError('Expected {} non-negative combo weights'.format(COMBOS_NUM))
+        self.weights = weights
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.weights))
+
+    @staticmethod
+    def full() -> 'HandRange':
+        return HandRange(np.ones(COMBOS_NUM))
+
+    @staticmethod
+    def from_pocket(codes: Sequence[int]) -> 'HandRange':
+        weights = np.zeros(COMBOS_NUM)
+        weights[COMBO_INDEX[codes[0], codes[1]]] = 1
+        return HandRange(weights)
+
+    @staticmethod
+    def from_combos(combo_weights: Dict[Tuple[int, int], float]) -> 'HandRange':
+        weights = np.zeros(COMBOS_NUM)
+        for (first, second), weight in combo_weights.items():
+            weights[COMBO_INDEX[first, second]] = weight
+        return HandRange(weights)
+
+    @staticmethod
+    def parse(text: str) -> 'HandRange':
+        # Comma separated standard notation with optional weights, later items override earlier ones:
+        # 'QQ+, AKs, AKo:0.5, 98s-65s, AhKh:0.25'
+        weights = np.zeros(COMBOS_NUM)
+        for item in text.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            token, _, weight = item.partition(':')
+            weights[_parse_token(token.strip())] = float(weight) if weight else 1.
+        return HandRange(weights)
+
+    def combos(self) -> Iterable[Tuple[Tuple[int, int], float]]:
+        for index in np.flatnonzero(self.weights):
+            yield tuple(COMBOS[index].tolist()), float(self.weights[index])
+
+    def digest(self) -> str:
+        return hashlib.sha1(self.weights.tobytes()).hexdigest()
+
+
+def comparison_weights(strengths: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Per cell: sum of weights over the columns of its row with a smaller strength, and over the
+    # columns with an equal one (the cell itself included). One sort of all rows at once instead of
+    # comparing every pair of columns
+    rows_num, columns_num = strengths.shape
+    keys = (strengths.astype(np.int64) + np.arange(rows_num, dtype=np.int64)[:, None] * _ROW_OFFSET).ravel()
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    cumulative = np.concatenate([[0.], np.cumsum(weights.ravel()[order])])
+    # Equal keys form runs in the sorted array; every key gets the bounds of its run
+    run_starts = np.flatnonzero(np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]]))
+    run_ids = np.repeat(np.arange(len(run_starts)), np.diff(np.append(run_starts, len(keys))))
+    left = np.empty(len(keys), dtype=np.intp)
+    right = np.empty(len(keys), dtype=np.intp)
+    left[order] = run_starts[run_ids]
+    right[order] = np.append(run_starts[1:], len(keys))[run_ids]
+    row_starts = np.repeat(np.arange(rows_num) * columns_num, columns_num)
+    below = (cumulative[left] - cumulative[row_starts]).reshape(rows_num, columns_num)
+    equal = (cumulative[right] - cumulative[left]).reshape(rows_num, columns_num)
+    return below, equal
+
+
+def weighted_comparisons(strengths: np.ndarray, weights_a: np.ndarray,
+                         weights_b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Per row: sum of weights_a[i] * weights_b[j] over columns with strengths[j] < strengths[i],
+    # and the same over strengths[j] == strengths[i]
+    below, equal = comparison_weights(strengths, weights_b)
+    return (weights_a * below).sum(axis=1), (weights_a * equal).sum(axis=1)
+
+
+class RangeShowdown(object):
+    # Range against range on every runout of the board: wins[i], ties[i] and totals[i] are the weights
+    # of won, tied and all (our combo, opponent combo) pairs on runout i, with each pair weighted by
+    # the product of combo weights and combos sharing a card with each other, the board or the runout
+    # dropped. my/opp_category_weights[i] are the range weights by hand category on runout i. Runout
+    # counts are street-independent, so later streets restrict them like RunoutShowdown
+
+    def __init__(self, runouts: np.ndarray, wins: np.ndarray, ties: np.ndarray, totals: np.ndarray,
+                 my_category_weights: np.ndarray, opp_category_weights: np.ndarray) -> None:
+        self.runouts = runouts
+        self.wins = wins
+        self.ties = ties
+        self.totals = totals
+        self.my_category_weights = my_category_weights
+        self.opp_category_weights = opp_category_weights
+
+    @staticmethod
+    def compute(my_range: HandRange, opp_range: HandRange, board_codes: Sequence[int],
+                batch_size: int = RUNOUTS_BATCH) -> 'RangeShowdown':
+        if len(board_codes) < 3:
+            raise ValueError('Range showdown needs at least the flop, got {} board cards'.format(len(board_codes)))
+        board_codes = np.array(board_codes, dtype=np.uint8)
+        deck = np.array([code for code in range(CARDS_NUM) if code not in board_codes], dtype=np.uint8)
+        runouts = deck[combinations_array(len(deck), 5 - len(board_codes))]
+        board_state = evaluation_state(board_codes)
+        runout_masks = np.zeros(len(runouts), dtype=np.uint64)
+        for column in runouts.T:
+            runout_masks |= np.left_shift(np.uint64(1), column.astype(np.uint64))
+
+        # Only combos without board cards and with weight in either range take part; the extra last
+        # column has zero weights and pads the per-card groups to one length
+        live = np.flatnonzero(~np.isin(COMBOS, board_codes).any(axis=1) &
+                              ((my_range.weights > 0) | (opp_range.weights > 0)))
+        combos = COMBOS[live]
+        combo_masks = np.left_shift(np.uint64(1), combos[:, 0].astype(np.uint64)) | \
+            np.left_shift(np.uint64(1), combos[:, 1].astype(np.uint64))
+        my_weights = np.append(my_range.weights[live], 0.)
+        opp_weights = np.append(opp_range.weights[live], 0.)
+        members = [np.flatnonzero((combos == code).any(axis=1)) for code in deck]
+        group_size = max([len(member) for member in members] + [1])
+        groups = np.full((len(deck), group_size), len(live), dtype=np.intp)
+        for card_idx, member in enumerate(members):
+            groups[card_idx, :len(member)] = member
+
+        wins = np.zeros(len(runouts))
+        ties = np.zeros(len(runouts))
+        totals = np.zeros(len(runouts))
+        my_category_weights = np.zeros((len(runouts), CATEGORIES_NUM))
+        opp_category_weights = np.zeros((len(runouts), CATEGORIES_NUM))
+        for start in range(0, len(runouts), batch_size):
+            batch = runouts[start:start + batch_size]
+            hands = np.empty((len(batch), len(live), 7 - len(board_codes)), dtype=np.uint8)
+            hands[:, :, :2] = combos
+            hands[:, :, 2:] = batch[:, None, :]
+            strengths = np.zeros((len(batch), len(live) + 1), dtype=np.int32)
+            strengths[:, :-1] = evaluate_strengths_array(hands.reshape(len(batch) * len(live), -1),
+                                                         board_state).reshape(len(batch), len(live))
+            valid = np.ones((len(batch), len(live) + 1), dtype=bool)
+            valid[:, :-1] = (combo_masks[None, :] & runout_masks[start:start + len(batch), None]) == 0
+            my = my_weights * valid
+            opp = opp_weights * valid
+
+            # Pairs sharing a card are counted by every per-card group the shared card belongs to;
+            # a combo paired with itself shares two cards, so it is added back once
+            all_wins, all_ties = weighted_comparisons(strengths, my, opp)
+            group_wins, group_ties = weighted_comparisons(strengths[:, groups].reshape(-1, group_size),
+                                                          my[:, groups].reshape(-1, group_size),
+                                                          opp[:, groups].reshape(-1, group_size))
+            same = (my * opp).sum(axis=1)
+            wins[start:start + len(batch)] = all_wins - group_wins.reshape(len(batch), -1).sum(axis=1)
+            ties[start:start + len(batch)] = all_ties - group_ties.reshape(len(batch), -1).sum(axis=1) + same
+            totals[start:start + len(batch)] = (my.sum(axis=1) * opp.sum(axis=1) -
+                                                (my[:, groups].sum(axis=2) * opp[:, groups].sum(axis=2)).sum(axis=1)
+                                                + same)
+            cells = (np.arange(len(batch))[:, None] * CATEGORIES_NUM + strengths_categories(strengths[:, :-1])).ravel()
+            cells_num = len(batch) * CATEGORIES_NUM
+            my_category_weights[start:start + len(batch)] = np.bincount(cells, my[:, :-1].ravel(),
+                                                                        cells_num).reshape(len(batch), -1)
+            opp_category_weights[start:start + len(batch)] = np.bincount(cells, opp[:, :-1].ravel(),
+                                                                         cells_num).reshape(len(batch), -1)
+        return RangeShowdown(runouts, wins, ties, totals, my_category_weights, opp_category_weights)
+
+    def restrict(self, board_codes: Sequence[int]) -> 'RangeShowdown':
+        mask = np.ones(len(self.runouts), dtype=bool)
+        for code in board_codes:
+            mask &= (self.runouts == code).any(axis=1)
+        runouts = self.runouts[mask]
+        runouts = runouts[~np.isin(runouts, board_codes)].reshape(len(runouts), -1)
+        return RangeShowdown(runouts, self.wins[mask], self.ties[mask], self.totals[mask],
+                             self.my_category_weights[mask], self.opp_category_weights[mask])
+
+    def probs(self) -> Tuple[float, float, float]:
+        total = self.totals.sum()
+        if total <= 0:
+            raise ValueError('The ranges have no combos compatible with the board')
+        win, tie = self.wins.sum() / total, self.ties.sum() / total
+        return float(win), float(tie), float(1 - win - tie)
+
+    def equity(self, opponents_num: int = 1) -> float:
+        # Heads-up equity is exact. Against several opponents holding the range, they are taken as
+        # independent on every runout (card removal between opponents is ignored), and runouts are
+        # weighted by the chance that all of them can be dealt
+        if opponents_num <= 1:
+            win, tie, _ = self.probs()
+            return win + tie / 2
+        live = self.totals > 0
+        win_probs = self.wins[live] / self.totals[live]
+        tie_probs = self.ties[live] / self.totals[live]
+        runout_weights = (self.totals[live] / self.totals[live].max()) ** opponents_num
+        shares = np.zeros((live.sum(), opponents_num + 1))
+        shares[:, 0] = 1
+        for _ in range(opponents_num):
+            shares[:, 1:] = shares[:, 1:] * win_probs[:, None] + shares[:, :-1] * tie_probs[:, None]
+            shares[:, 0] *= win_probs
+        runout_equities = shares @ (1 / np.arange(1, opponents_num + 2))
+        return float((runout_equities * runout_weights).sum() / runout_weights.sum())
+
+    def result_dict(self, opponents_num: int = 1) -> dict:
+        my_weights = self.my_category_weights.sum(axis=0)
+        opp_weights = self.opp_category_weights.sum(axis=0)
+        return {'my_probs': (my_weights / my_weights.sum()).tolist(),
+                'opponent_probs': (opp_weights / opp_weights.sum()).tolist(),
+                'win_prob': self.equity(max(opponents_num, 1))}
+
+
+class PocketsShowdown(object):
+    # Heads-up showdown of every pocket against any two cards on one board: for live combo i (no board
+    # card) wins[i] and ties[i] count won and tied showdowns over all runouts and opponent pockets, and
+    # my/opp_category_counts[i] the categories behind them. One pass serves every pocket on the board
+
+    def __init__(self, board_codes: Tuple[int, ...], live: np.ndarray, wins: np.ndarray, ties: np.ndarray,
+                 my_category_counts: np.ndarray, opp_category_counts: np.ndarray, showdowns_num: int) -> None:
+        self.board_codes = board_codes
+        self.live = live
+        self.wins = wins
+        self.ties = ties
+        self.my_category_counts = my_category_counts
+        self.opp_category_counts = opp_category_counts
+        self.showdowns_num = showdowns_num
+        self._positions = np.full(COMBOS_NUM, -1, dtype=np.intp)
+        self._positions[live] = np.arange(len(live))
+
+    @staticmethod
+    def compute(board_codes: Sequence[int], batch_size: int = RUNOUTS_BATCH) -> 'PocketsShowdown':
+        if len(board_codes) < 3:
+            raise ValueError('Pockets showdown needs at least the flop, got {} board cards'.format(len(board_codes)))
+        board = np.array(board_codes, dtype=np.uint8)
+        deck = np.array([code for code in range(CARDS_NUM) if code not in board], dtype=np.uint8)
+        runout_size = 5 - len(board)
+        runouts = deck[combinations_array(len(deck), runout_size)]
+        board_state = evaluation_state(board_codes)
+        runout_masks = np.zeros(len(runouts), dtype=np.uint64)
+        for column in runouts.T:
+            runout_masks |= np.left_shift(np.uint64(1), column.astype(np.uint64))
+        live = np.flatnonzero(~np.isin(COMBOS, board).any(axis=1))
+        combos = COMBOS[live]
+        combo_masks = np.left_shift(np.uint64(1), combos[:, 0].astype(np.uint64)) | \
+            np.left_shift(np.uint64(1), combos[:, 1].astype(np.uint64))
+        # groups[c] lists the combos holding deck card c (the same number for every card); a combo is
+        # found in the groups of its two cards at card_positions and slots
+        groups = np.array([np.flatnonzero((combos == code).any(axis=1)) for code in deck])
+        card_positions = np.searchsorted(deck, combos)
+        slots = np.argmax(groups[card_positions] == np.arange(len(live))[:, None, None], axis=2)
+        cards_num, group_size = groups.shape
+
+        wins = np.zeros(len(live))
+        ties = np.zeros(len(live))
+        my_category_counts = np.zeros((len(live), CATEGORIES_NUM))
+        opp_category_counts = np.zeros((len(live), CATEGORIES_NUM))
+        for start in range(0, len(runouts), batch_size):
+            batch = runouts[start:start + batch_size]
+            batch_num = len(batch)
+            hands = np.empty((batch_num, len(live), 7 - len(board)), dtype=np.uint8)
+            hands[:, :, :2] = combos
+            hands[:, :, 2:] = batch[:, None, :]
+            strengths = evaluate_strengths_array(hands.reshape(batch_num * len(live), -1),
+                                                 board_state).reshape(batch_num, len(live))
+            valid = ((combo_masks[None, :] & runout_masks[start:start + batch_num, None]) == 0).astype(np.float64)
+
+            # Opponents sharing a card with our combo are counted by its two card groups and taken back;
+            # the combo itself is in both groups, so it is added back once
+            below, equal = comparison_weights(strengths, valid)
+            group_below, group_equal = (part.reshape(batch_num, cards_num, group_size) for part in
+                                        comparison_weights(strengths[:, groups].reshape(-1, group_size),
+                                                           valid[:, groups].reshape(-1, group_size)))
+            shared_below = group_below[:, card_positions[:, 0], slots[:, 0]] + \
+                group_below[:, card_positions[:, 1], slots[:, 1]]
+            shared_equal = group_equal[:, card_positions[:, 0], slots[:, 0]] + \
+                group_equal[:, card_positions[:, 1], slots[:, 1]]
+            wins += (valid * (below - shared_below)).sum(axis=0)
+            ties += (valid * (equal - shared_equal + 1)).sum(axis=0)
+
+            categories = strengths_categories(strengths)
+            own = np.bincount((np.arange(len(live)) * CATEGORIES_NUM + categories).ravel(), valid.ravel(),
+                              len(live) * CATEGORIES_NUM).reshape(len(live), CATEGORIES_NUM)
+            all_hist = np.bincount((np.arange(batch_num)[:, None] * CATEGORIES_NUM + categories).ravel(),
+                                   valid.ravel(), batch_num * CATEGORIES_NUM).reshape(batch_num, CATEGORIES_NUM)
+            group_ids = (np.arange(batch_num * cards_num).reshape(batch_num, cards_num, 1) * CATEGORIES_NUM +
+                         categories[:, groups])
+            group_hist = np.bincount(group_ids.ravel(), valid[:, groups].ravel(),
+                                     batch_num * cards_num * CATEGORIES_NUM).reshape(batch_num, cards_num,
+                                                                                     CATEGORIES_NUM)
+            my_category_counts += own
+            opp_category_counts += valid.T @ all_hist + own
+            for side in range(2):
+                opp_category_counts -= (valid[:, :, None] * group_hist[:, card_positions[:, side]]).sum(axis=0)
+
+        showdowns_num = comb(len(deck) - 2, runout_size) * comb(len(deck) - runout_size - 2, 2)
+        return PocketsShowdown(tuple(board_codes), live, np.rint(wins), np.rint(ties), np.rint(my_category_counts),
+                               np.rint(opp_category_counts), showdowns_num)
+
+    def probs(self, pocket_codes: Sequence[int]) -> Tuple[float, float, float]:
+        position = self._positions[COMBO_INDEX[pocket_codes[0], pocket_codes[1]]]
+        if position < 0:
+            raise ValueError('Pocket {} clashes with the board {}'.format(tuple(pocket_codes), self.board_codes))
+        win = float(self.wins[position]) / self.showdowns_num
+        tie = float(self.ties[position]) / self.showdowns_num
+        return win, tie, 1 - win - tie
+
+    def result_dict(self, pocket_codes: Sequence[int]) -> dict:
+        win, tie, loss = self.probs(pocket_codes)
+        position = self._positions[COMBO_INDEX[pocket_codes[0], pocket_codes[1]]]
+        my_counts = self.my_category_counts[position]
+        opp_counts = self.opp_category_counts[position]
+        return {'my_probs': (my_counts / my_counts.sum()).tolist(),
+                'opponent_probs': (opp_counts / opp_counts.sum()).tolist(),
+                'win_prob': win + tie / 2,
+                'win': win,
+                'tie': tie,
+                'loss': loss}
+
+
+def range_equity(my_range: HandRange, opp_range: HandRange, board_codes: Sequence[int]) -> dict:
+    # Exact from the flop on; pre-flop range equity is not enumerated, so the board is required
+    win, tie, loss = RangeShowdown.compute(my_range, opp_range, board_codes).probs()
+    return {'win': win, 'tie': tie, 'loss': loss, 'equity': win + tie / 2}
@@ -0,0 +1,21 @@
+from math import comb
+from typing import Sequence, Tuple
+
+
+def rank_combination(indices: Sequence[int], n: int) -> int:
+    # Lexicographic index of the sorted k-subset `indices` of range(n)
+    k = len(indices)
+    return comb(n, k) - 1 - sum(comb(n - 1 - index, k - i) for i, index in enumerate(indices))
+
+
+def unrank_combination(rank: int, n: int, k: int) -> Tuple[int, ...]:
+    indices = []
+    index = 0
+    for i in range(k):
+        # Subsets starting with `index` occupy the next C(n - 1 - index, k - i - 1) ranks
+        while rank >= comb(n - 1 - index, k - i - 1):
+            rank -= comb(n - 1 - index, k - i - 1)
+            index += 1
+        indices.append(index)
+        index += 1
+    return tuple(indices)
@@ -0,0 +1,256 @@
+from typing import Dict, List, Sequence, Tuple
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+
+from .canonical import ResultCache, canonical_key
+from .evaluator import cards_codes
+from .executor import Executor
+from .game_stages import STREET_METHODS, Game, check_opponents_num, validate_hand
+from .objects import ALL_CARDS_BY_CODE, Pocket, Table, parse_cards
+
+DEFAULT_PORT = 8765
+# Deadline error response, also used by clients to tell it from other failures
+DEADLINE_EXCEEDED = 'deadline exceeded'
+
+_serial_executor = Executor('serial')
+_worker_cache = None
+
+
+def query_equity(args: Tuple) -> float:
+    # Runs in a worker: one query on its current street, serially
+    global _worker_cache
+    if _worker_cache is None:
+        _worker_cache = ResultCache()
+    pocket_codes, board_codes, opponents_num = args
+    game = Game(Pocket([ALL_CARDS_BY_CODE[code] for code in pocket_codes]),
+                Table([ALL_CARDS_BY_CODE[code] for code in board_codes]), opponents_num,
+                _serial_executor, _worker_cache)
+    return getattr(game, STREET_METHODS[len(board_codes)])()['win_prob']
+
+
+class EquityServer(object):
+    # Newline-delimited JSON over TCP or a Unix socket. A request {"id", "pocket", "board", "opponents",
+    # "deadline"} gets {"id", "win_prob", "coalesced", "elapsed"} or {"id", "error"}. Requests of one
+    # connection are served concurrently and answered as they finish, so clients match them by id.
+    # Queries equal up to suit relabeling share one computation while it is in flight and are then
+    # answered from the cache; a request past its deadline (seconds) fails without cancelling the
+    # computation other requests may wait for
+
+    def __init__(self, executor: Executor, cache: ResultCache = None) -> None:
+        self.executor = executor
+        self.cache = ResultCache() if cache is None else cache
+        self.in_flight: Dict[Tuple, asyncio.Future] = dict()
+        self.served = 0
+        self.computed = 0
+        self.coalesced = 0
+
+    async def equity(self, pocket_codes: Tuple[int, ...], board_codes: Tuple[int, ...],
+                     opponents_num: int) -> Tuple[float, bool]:
+        key = (opponents_num, canonical_key(pocket_codes, board_codes))
+        win_prob = self.cache.get(key)
+        if win_prob is not None:
+            return win_prob, True
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future), True
+        future = asyncio.wrap_future(self.executor.submit(query_equity, (pocket_codes, board_codes, opponents_num)))
+        self.in_flight[key] = future
+        self.computed += 1
+
+        # Runs even if every waiting request is past its deadline, so the result still reaches the cache
+        def finish(done: asyncio.Future) -> None:
+            self.in_flight.pop(key, None)
+            if not done.cancelled() and done.exception() is None:
+                self.cache.put(key, done.result())
+
+        future.add_done_callback(finish)
+        return await asyncio.shield(future), False
+
+    async def handle_request(self, line: bytes) -> dict:
+        start = time.perf_counter()
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            pocket_codes = tuple(cards_codes(parse_cards(request['pocket'])))
+            board_codes = tuple(cards_codes(parse_cards(request.get('board') or ())))
+            validate_hand(pocket_codes, board_codes)
+            # Checked here, so a bad request fails before any work is submitted
+            opponents_num = check_opponents_num(request.get('opponents', 1))
+            win_prob, coalesced = await asyncio.wait_for(self.equity(pocket_codes, board_codes, opponents_num),
+                                                         request.get('deadline'))
+        except asyncio.TimeoutError:
+            return {'id': request_id, 'error': DEADLINE_EXCEEDED}
+        except Exception as exc:
+            return {'id': request_id, 'error': '{}: {}'.format(type(exc).__name__, exc)}
+        finally:
+            self.served += 1
+        return {'id': request_id, 'win_prob': win_prob, 'coalesced': coalesced,
+                'elapsed': time.perf_counter() - start}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        async def respond(line: bytes) -> None:
+            response = await self.handle_request(line)
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.ensure_future(respond(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+                    path: str = None) -> asyncio.AbstractServer:
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle_connection, path)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def stats(self) -> dict:
+        return {'served': self.served,
+                'computed': self.computed,
+                'coalesced': self.coalesced,
+                'in_flight': len(self.in_flight),
+                'cache': self.cache.stats()}
+
+
+class EquityClient(object):
+    # One connection with any number of pipelined queries, matched to responses by id
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+        self._ids = itertools.count()
+        self._waiting: Dict[int, asyncio.Future] = dict()
+        self._reading = asyncio.ensure_future(self._read_responses())
+
+    @staticmethod
+    async def connect(host: str = '127.0.0.1', port: int = DEFAULT_PORT, path: str = None) -> 'EquityClient':
+        if path is not None:
+            return EquityClient(*await asyncio.open_unix_connection(path))
+        return EquityClient(*await asyncio.open_connection(host, port))
+
+    async def _read_responses(self) -> None:
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self._waiting.pop(response['id'], None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self._waiting.values():
+            if not future.done():
+                future.set_exception(ConnectionError('Connection closed by the server'))
+
+    async def query(self, pocket: Sequence[str], board: Sequence[str] = (), opponents_num: int = 1,
+                    deadline: float = None) -> dict:
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+        request = {'id': request_id, 'pocket': list(pocket), 'board': list(board), 'opponents': opponents_num}
+        if deadline is not None:
+            request['deadline'] = deadline
+        self.writer.write(json.dumps(request).encode() + b'\n')
+        await self.writer.drain()
+        return await future
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self._reading
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+async def play_table(client: EquityClient, hands_num: int, rnd: random.Random, latencies: List[float],
+                     deadline: float = None) -> int:
+    # One table: every hand is queried on each street, waiting for the answer before the next street
+    errors = 0
+    cards = [value + suit for value in '23456789TJQKA' for suit in 'dchs']
+    for _ in range(hands_num):
+        dealt = rnd.sample(cards, 7)
+        opponents_num = rnd.randint(1, 5)
+        for board_cards_num in STREET_METHODS:
+            start = time.perf_counter()
+            response = await client.query(dealt[:2], dealt[2:2 + board_cards_num], opponents_num, deadline)
+            latencies.append(time.perf_counter() - start)
+            errors += 'error' in response
+    return errors
+
+
+async def load_test(tables_num: int, hands_num: int, host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+                    path: str = None, deadline: float = None, seed: int = 0) -> dict:
+    # Every table has its own connection and plays hands_num random hands concurrently with the others
+    clients = [await EquityClient.connect(host, port, path) for _ in range(tables_num)]
+    latencies = list()
+    start = time.perf_counter()
+    errors = await asyncio.gather(*(play_table(client, hands_num, random.Random(seed + table_idx), latencies,
+                                               deadline) for table_idx, client in enumerate(clients)))
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        await client.close()
+    return {'tables': tables_num,
+            'queries': len(latencies),
+            'errors': sum(errors),
+            'elapsed': elapsed,
+            'queries_per_second': len(latencies) / elapsed,
+            'latency_p50': percentile(latencies, 0.5),
+            'latency_p95': percentile(latencies, 0.95),
+            'latency_p99': percentile(latencies, 0.99)}
+
+
+async def serve(host: str, port: int, path: str, workers: int) -> None:
+    with Executor(workers=workers) as executor:
+        server = await EquityServer(executor).start(host, port, path)
+        sys.stderr.write('Serving on {}\n'.format(path or '{}:{}'.format(host, port)))
+        async with server:
+            await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Equity service and its load generator')
+    parser.add_argument('mode', choices=('serve', 'load'))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', help='Unix socket path instead of TCP')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--tables', type=int, default=16, help='concurrent tables of the load generator')
+    parser.add_argument('--hands', type=int, default=10, help='hands per table of the load generator')
+    parser.add_argument('--deadline', type=float, default=None, help='per-query deadline, seconds')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the load generator hands')
+    args = parser.parse_args()
+    if args.mode == 'serve':
+        try:
+            asyncio.run(serve(args.host, args.port, args.unix, args.workers))
+        except KeyboardInterrupt:
+            pass
+    else:
+        stats = asyncio.run(load_test(args.tables, args.hands, args.host, args.port, args.unix, args.deadline,
+                                      args.seed))
+        print(json.dumps(stats, indent=2))
+
+
+if __name__ == '__main__':
+    main()
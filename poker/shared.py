@@ -0,0 +1,74 @@
+from collections import OrderedDict
+from typing import Any, List, Tuple, Union
+
+import numpy as np
+
+# Only per-query inputs go through shared memory. The evaluator lookup tables (about 300 KB) are built
+# once when a worker imports the evaluator; forked workers inherit them from the parent, and a pool
+# worker lives for many queries, so sharing them would save neither traffic nor per-query time
+
+# Handle of a shared array: segment name, shape and dtype; small enough to go with every task
+SharedHandle = Tuple[str, Tuple[int, ...], str]
+# Segments a worker keeps mapped; older ones are closed, the creator has usually unlinked them by then
+ATTACHED_MAX = 8
+
+# multiprocessing.shared_memory is imported on first use: serial and thread runs never need it
+_attached: 'OrderedDict[str, Tuple[Any, np.ndarray]]' = OrderedDict()
+
+
+class SharedArrays(object):
+    # Read-only inputs of one computation placed in shared memory, so that tasks carry handles instead
+    # of pickled arrays and every worker maps a segment once. Segments live until the with block ends.
+    # Disabled (for serial and thread executors) it hands the arrays themselves to the tasks
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.nbytes = 0
+        self._segments: List[Any] = list()
+
+    def __enter__(self) -> 'SharedArrays':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def share(self, array: np.ndarray) -> Union[np.ndarray, SharedHandle]:
+        if not self.enabled or array is None:
+            return array
+        from multiprocessing import shared_memory
+        array = np.ascontiguousarray(array)
+        segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._segments.append(segment)
+        np.ndarray(array.shape, array.dtype, buffer=segment.buf)[...] = array
+        self.nbytes += array.nbytes
+        return segment.name, array.shape, array.dtype.str
+
+    def close(self) -> None:
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+        self._segments = list()
+
+
+def attach(shared: Union[np.ndarray, SharedHandle]) -> np.ndarray:
+    # The array behind a handle, mapped once per worker; arrays and None pass through
+    if shared is None or isinstance(shared, np.ndarray):
+        return shared
+    name, shape, dtype = shared
+    if name in _attached:
+        _attached.move_to_end(name)
+        return _attached[name][1]
+    from multiprocessing import shared_memory
+    segment = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype, buffer=segment.buf)
+    array.flags.writeable = False
+    _attached[name] = segment, array
+    while len(_attached) > ATTACHED_MAX:
+        _, (old_segment, old_array) = _attached.popitem(last=False)
+        del old_array
+        try:
+            old_segment.close()
+        except BufferError:
+            # A caller still holds a view of it; the mapping goes away with the last view
+            pass
+    return array
@@ -0,0 +1,265 @@
+from math import comb
+from typing import List, Sequence, Tuple
+import pickle
+
+import numpy as np
+
+from .evaluator import CARDS_NUM
+from .enumeration import chunk_descriptors, generate_chunk, rank_combinations_array
+from .executor import Executor
+from .profiling import Profiler, phase
+from .shared import SharedArrays, attach
+from .suit_classes import class_evaluations_num, class_showdown_counts
+from .vectorized import combinations_array, evaluate_strengths_array, evaluation_state, strengths_categories
+
+CATEGORIES_NUM = 10
+CHUNK_SIZE = 16384
+HISTOGRAM_BINS = 10
+# Heads-up status of a showdown: we are ahead, tied or behind
+AHEAD, TIED, BEHIND = 0, 1, 2
+
+
+def showdown_chunk(args: Tuple) -> Tuple[np.ndarray, ...]:
+    # Every unseen set of runout + 2 opponent cards is one 7-card opponent hand shared by all ways to
+    # split it into runout and hole cards, so it is evaluated once and compared against each split.
+    # Per-card counts are only needed against several opponents and are skipped without card_counts.
+    # With now_status (our status against every opponent pocket on the current board) the current and
+    # final statuses of every showdown are counted jointly for the hand potential
+    board_codes, deck, descriptor, my_strengths, runout_size, card_counts, now_status = args
+    unseen = generate_chunk(descriptor)
+    runouts_num = len(my_strengths)
+    deck_size = len(deck)
+    opp_strengths = evaluate_strengths_array(deck[unseen], evaluation_state(board_codes))
+    opp_categories = strengths_categories(opp_strengths)
+    losses = np.zeros(runouts_num, dtype=np.int64)
+    ties = np.zeros(runouts_num, dtype=np.int64)
+    card_columns = deck_size if card_counts else 0
+    card_wins = np.zeros(runouts_num * card_columns, dtype=np.int64)
+    card_ties = np.zeros(runouts_num * card_columns, dtype=np.int64)
+    category_counts = np.zeros(runouts_num * CATEGORIES_NUM, dtype=np.int64)
+    potential_counts = np.zeros(9, dtype=np.int64)
+    all_positions = set(range(unseen.shape[1]))
+    for positions in combinations_array(unseen.shape[1], runout_size):
+        runout_ids = rank_combinations_array(unseen[:, positions], deck_size)
+        runout_strengths = my_strengths[runout_ids]
+        tied = opp_strengths == runout_strengths
+        losses += np.bincount(runout_ids[opp_strengths > runout_strengths], minlength=runouts_num)
+        ties += np.bincount(runout_ids[tied], minlength=runouts_num)
+        category_counts += np.bincount(runout_ids * CATEGORIES_NUM + opp_categories,
+                                       minlength=runouts_num * CATEGORIES_NUM)
+        hole_positions = sorted(all_positions - set(positions.tolist()))
+        if now_status is not None:
+            final_status = (opp_strengths >= runout_strengths).astype(np.intp) + (opp_strengths > runout_strengths)
+            pocket_ids = rank_combinations_array(unseen[:, hole_positions], deck_size)
+            potential_counts += np.bincount(now_status[pocket_ids] * 3 + final_status, minlength=9)
+        if not card_counts:
+            continue
+        won = opp_strengths < runout_strengths
+        for hole_position in hole_positions:
+            card_ids = runout_ids * deck_size + unseen[:, hole_position]
+            card_wins += np.bincount(card_ids[won], minlength=runouts_num * deck_size)
+            card_ties += np.bincount(card_ids[tied], minlength=runouts_num * deck_size)
+    return (losses, ties, card_wins.reshape(runouts_num, card_columns), card_ties.reshape(runouts_num, card_columns),
+            category_counts.reshape(runouts_num, CATEGORIES_NUM), potential_counts.reshape(3, 3))
+
+
+def merge_counts(totals: Tuple[np.ndarray, ...], counts: Tuple[np.ndarray, ...]) -> Tuple[np.ndarray, ...]:
+    if totals is None:
+        return counts
+    for total, part in zip(totals, counts):
+        total += part
+    return totals
+
+
+def showdown_chunks(args: Tuple) -> Tuple[np.ndarray, ...]:
+    # One task per worker: its share of the chunks is summed where it is computed, so a single set of
+    # count arrays comes back. Our strengths and current statuses may be shared memory handles
+    board_codes, deck, descriptors, my_strengths, runout_size, card_counts, now_status = args
+    my_strengths, now_status = attach(my_strengths), attach(now_status)
+    totals = None
+    for descriptor in descriptors:
+        totals = merge_counts(totals, showdown_chunk((board_codes, deck, descriptor, my_strengths, runout_size,
+                                                      card_counts, now_status)))
+    return totals
+
+
+class RunoutShowdown(object):
+    # Heads-up showdown counts for every runout of the board: for runout i, out of pockets_num possible
+    # opponent pockets wins[i] lose to us, ties[i] split and losses[i] beat us. card_wins[i, c] and
+    # card_ties[i, c] count the won and tied pockets holding unseen card c. potential_counts[now, final]
+    # counts showdowns by our status on the current board and at the river, when asked for
+
+    def __init__(self, runouts: np.ndarray, my_strengths: np.ndarray, wins: np.ndarray, ties: np.ndarray,
+                 losses: np.ndarray, card_wins: np.ndarray, card_ties: np.ndarray, opp_category_counts: np.ndarray,
+                 pockets_num: int, pocket_cards_num: int, potential_counts: np.ndarray = None) -> None:
+        self.runouts = runouts
+        self.my_strengths = my_strengths
+        self.wins = wins
+        self.ties = ties
+        self.losses = losses
+        self.card_wins = card_wins
+        self.card_ties = card_ties
+        self.opp_category_counts = opp_category_counts
+        self.pockets_num = pockets_num
+        self.pocket_cards_num = pocket_cards_num
+        self.potential_counts = potential_counts
+
+    @staticmethod
+    def compute(pocket_codes: Sequence[int], board_codes: Sequence[int], executor: Executor = None,
+                profiler: Profiler = None, card_counts: bool = True, potential: bool = False) -> 'RunoutShowdown':
+        known = set(pocket_codes) | set(board_codes)
+        deck = np.array([code for code in range(CARDS_NUM) if code not in known], dtype=np.uint8)
+        board_codes = np.array(board_codes, dtype=np.uint8)
+        runout_size = 5 - len(board_codes)
+
+        # Pocket and board masks are built once; each runout only folds in its own cards
+        board_state = evaluation_state(board_codes)
+        runouts = deck[combinations_array(len(deck), runout_size)]
+        with phase(profiler, 'showdown.my_hands'):
+            my_strengths = evaluate_strengths_array(runouts, evaluation_state(pocket_codes, board_state))
+
+        pocket_cards_num = len(deck) - runout_size
+        pockets_num = comb(pocket_cards_num, 2)
+        # Heads-up counts without potential can come from suit classes: when few suits can make a flush
+        # the other suits collapse into ranks, which needs far fewer evaluations on most boards
+        if not card_counts and not potential and \
+                class_evaluations_num(board_codes, deck, runout_size) < comb(len(deck), runout_size + 2):
+            with phase(profiler, 'showdown.classes'):
+                wins, ties, losses, opp_category_counts = class_showdown_counts(board_codes, deck, runouts,
+                                                                                my_strengths)
+            empty = np.zeros((len(runouts), 0), dtype=np.int64)
+            return RunoutShowdown(runouts, my_strengths, wins, ties, losses, empty, empty, opp_category_counts,
+                                  pockets_num, pocket_cards_num)
+
+        now_status = None
+        if potential:
+            # Current hands: ours and every opponent pocket on the board as it is now
+            pockets = np.vstack([deck[combinations_array(len(deck), 2)], np.array([pocket_codes], dtype=np.uint8)])
+            now_strengths = evaluate_strengths_array(pockets, board_state)
+            now_status = ((now_strengths[:-1] >= now_strengths[-1]).astype(np.intp) +
+                          (now_strengths[:-1] > now_strengths[-1]))
+
+        # Unseen card sets are streamed in chunks, so memory stays bounded by the chunk size. Every worker
+        # gets one task with its share of the chunks and the arrays in shared memory, so the bytes
+        # crossing processes grow with the number of workers rather than with the number of chunks
+        descriptors = list(chunk_descriptors(len(deck), runout_size + 2, CHUNK_SIZE))
+        tasks_num = 1 if executor is None else min(executor.workers, len(descriptors))
+        shipped = executor is not None and executor.backend == 'process' and tasks_num > 1
+        with SharedArrays(shipped) as shared:
+            my_shared, now_shared = shared.share(my_strengths), shared.share(now_status)
+            tasks = [(board_codes, deck, descriptors[task_idx::tasks_num], my_shared, runout_size, card_counts,
+                      now_shared) for task_idx in range(tasks_num)]
+            if profiler is not None:
+                profiler.count('hands_evaluated', len(runouts) + comb(len(deck), runout_size + 2) +
+                               (0 if now_status is None else len(now_status) + 1))
+                profiler.count('chunks', len(descriptors))
+                if shipped:
+                    profiler.count('pool_starts', int(not executor.started))
+                    profiler.count('bytes_shipped', sum(len(pickle.dumps(task)) for task in tasks))
+                    profiler.count('bytes_shared', shared.nbytes)
+            with phase(profiler, 'showdown.chunks'):
+                results = map(showdown_chunks, tasks) if executor is None else executor.imap(showdown_chunks, tasks)
+                totals = None
+                for task_results in results:
+                    if profiler is not None and shipped:
+                        profiler.count('bytes_received', len(pickle.dumps(task_results)))
+                    totals = merge_counts(totals, task_results)
+        losses, ties, card_wins, card_ties, opp_category_counts, potential_counts = totals
+        return RunoutShowdown(runouts, my_strengths, pockets_num - losses - ties, ties, losses, card_wins, card_ties,
+                              opp_category_counts, pockets_num, pocket_cards_num,
+                              potential_counts if potential else None)
+
+    def restrict(self, board_codes: Sequence[int]) -> 'RunoutShowdown':
+        # Showdown of a later street: keeps the runouts which contain the newly opened board cards.
+        # Per-runout counts do not depend on the street, so nothing is evaluated again
+        mask = np.ones(len(self.runouts), dtype=bool)
+        for code in board_codes:
+            mask &= (self.runouts == code).any(axis=1)
+        runouts = self.runouts[mask]
+        runouts = runouts[~np.isin(runouts, board_codes)].reshape(len(runouts), -1)
+        return RunoutShowdown(runouts, self.my_strengths[mask], self.wins[mask], self.ties[mask], self.losses[mask],
+                              self.card_wins[mask], self.card_ties[mask], self.opp_category_counts[mask],
+                              self.pockets_num, self.pocket_cards_num)
+
+    @property
+    def has_card_counts(self) -> bool:
+        return self.card_wins.shape[1] > 0
+
+    def probs(self) -> Tuple[float, float, float]:
+        # Exact heads-up win, tie and loss probabilities over every runout and opponent pocket
+        showdowns_num = self.pockets_num * len(self.runouts)
+        return (float(self.wins.sum() / showdowns_num), float(self.ties.sum() / showdowns_num),
+                float(self.losses.sum() / showdowns_num))
+
+    def hand_strengths(self) -> np.ndarray:
+        # Heads-up pot share at the river on every runout
+        return (self.wins + self.ties / 2) / self.pockets_num
+
+    def potential_dict(self, bins: int = HISTOGRAM_BINS) -> dict:
+        # Distribution of the river hand strength over runouts and the hand potential (Billings et al.):
+        # ppot is the chance to get ahead from behind, npot to fall behind from ahead, with ties as half.
+        # ehs, the mean river strength, equals hand_strength * (1 - npot) + (1 - hand_strength) * ppot
+        if self.potential_counts is None:
+            raise ValueError('Hand potential needs a showdown computed with potential')
+        strengths = self.hand_strengths()
+        counts = self.potential_counts
+        now_totals = counts.sum(axis=1)
+        hand_strength = (now_totals[AHEAD] + now_totals[TIED] / 2) / now_totals.sum()
+        ppot_base = now_totals[BEHIND] + now_totals[TIED] / 2
+        npot_base = now_totals[AHEAD] + now_totals[TIED] / 2
+        ppot = (counts[BEHIND, AHEAD] + counts[BEHIND, TIED] / 2 + counts[TIED, AHEAD] / 2) / ppot_base \
+            if ppot_base else 0.
+        npot = (counts[AHEAD, BEHIND] + counts[TIED, BEHIND] / 2 + counts[AHEAD, TIED] / 2) / npot_base \
+            if npot_base else 0.
+        histogram, _ = np.histogram(strengths, bins=bins, range=(0., 1.))
+        return {'hand_strength': float(hand_strength),
+                'ppot': float(ppot),
+                'npot': float(npot),
+                'ehs': float(strengths.mean()),
+                'ehs2': float((strengths * strengths).mean()),
+                'histogram': (histogram / len(strengths)).tolist()}
+
+    def my_probs(self) -> List[float]:
+        return (np.bincount(strengths_categories(self.my_strengths), minlength=CATEGORIES_NUM) /
+                len(self.my_strengths)).tolist()
+
+    def opponent_probs(self) -> List[float]:
+        counts = self.opp_category_counts.sum(axis=0)
+        return (counts / counts.sum()).tolist()
+
+    def runout_equities(self, opponents_num: int = 1) -> np.ndarray:
+        # Pot share against opponents_num opponents on every runout. Opponent k draws from the pockets
+        # left after k - 1 earlier opponents which we did not lose to. Each earlier pocket removes the
+        # won and tied pockets sharing a card with it (estimated from the per-card counts), and every
+        # two earlier pockets give back the 4 pockets made of one card from each of them
+        if not 1 <= opponents_num <= self.pocket_cards_num // 2:
+            raise ValueError('Between 1 and {} opponents can be dealt, got {}'.format(self.pocket_cards_num // 2,
+                                                                                      opponents_num))
+        if opponents_num > 1 and not self.has_card_counts:
+            raise ValueError('Equity against several opponents needs a showdown computed with card counts')
+        not_lost = self.wins + self.ties
+        safe_not_lost = np.maximum(not_lost, 1)
+        card_not_lost = self.card_wins + self.card_ties
+        removed_wins = ((card_not_lost * self.card_wins).sum(axis=1) - self.wins) / safe_not_lost
+        removed_ties = ((card_not_lost * self.card_ties).sum(axis=1) - self.ties) / safe_not_lost
+        # shares[:, j] is the probability that exactly j opponents tie with us and the rest lose
+        shares = np.zeros((len(self.runouts), opponents_num + 1))
+        shares[:, 0] = 1
+        for earlier_num in range(opponents_num):
+            left_num = comb(self.pocket_cards_num - 2 * earlier_num, 2)
+            crossed_num = 2 * earlier_num * (earlier_num - 1)
+            win_probs = np.clip(self.wins * (1 + crossed_num / self.pockets_num) - earlier_num * removed_wins,
+                                0, None) / left_num
+            tie_probs = np.clip(self.ties * (1 + crossed_num / self.pockets_num) - earlier_num * removed_ties,
+                                0, None) / left_num
+            shares[:, 1:] = shares[:, 1:] * win_probs[:, None] + shares[:, :-1] * tie_probs[:, None]
+            shares[:, 0] *= win_probs
+        return shares @ (1 / np.arange(1, opponents_num + 2))
+
+    def equity(self, opponents_num: int = 1) -> float:
+        return float(self.runout_equities(opponents_num).mean())
+
+    def result_dict(self, opponents_num: int = 1) -> dict:
+        return {'my_probs': self.my_probs(),
+                'opponent_probs': self.opponent_probs(),
+                'win_prob': self.equity(max(opponents_num, 1))}
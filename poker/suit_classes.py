@@ -0,0 +1,108 @@
+from math import comb
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from .evaluator import HIGH_CARD, SUITS_NUM
+from .vectorized import combinations_array, evaluate_strengths_array, evaluation_state, strengths_categories
+
+# Class showdown counts: (wins, ties, losses, opponent category counts) per concrete runout
+ClassCounts = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def card_classes(board_codes: Sequence[int], deck: np.ndarray, runout_size: int) -> np.ndarray:
+    # A suit matters only if its board cards, the runout and a pocket can make five of it. Cards of the
+    # other suits are interchangeable within a rank, so they share a class; every card of a suit that
+    # matters is its own class. Returns the class id of every deck card
+    board_suits = np.bincount(np.asarray(board_codes, dtype=np.intp) & 3, minlength=SUITS_NUM)
+    flush_suits = board_suits + runout_size + 2 >= 5
+    keys = [(code >> 2, code & 3) if flush_suits[code & 3] else (code >> 2, -1) for code in deck.tolist()]
+    class_keys = sorted(set(keys))
+    return np.array([class_keys.index(key) for key in keys], dtype=np.intp)
+
+
+def class_multisets(classes_num: int, size: int) -> np.ndarray:
+    # Non-decreasing class id tuples of the given size (multisets of classes), as a (n, size) array
+    if size == 0:
+        return np.zeros((1, 0), dtype=np.intp)
+    if size == 1:
+        return np.arange(classes_num, dtype=np.intp)[:, None]
+    pairs = combinations_array(classes_num + 1, 2).astype(np.intp)
+    return np.stack([pairs[:, 0], pairs[:, 1] - 1], axis=1)
+
+
+def multiset_weights(multisets: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    # Number of concrete card sets behind every multiset of at most 2 classes; sizes may be given per
+    # row as a (rows, classes) array, which gives a (rows, multisets) result
+    if multisets.shape[1] == 0:
+        return np.ones(sizes.shape[:-1] + (1,), dtype=np.int64)
+    first = sizes[..., multisets[:, 0]]
+    if multisets.shape[1] == 1:
+        return first.astype(np.int64)
+    second = sizes[..., multisets[:, 1]]
+    same = multisets[:, 0] == multisets[:, 1]
+    return np.where(same, first * (first - 1) // 2, first * second).astype(np.int64)
+
+
+def class_evaluations_num(board_codes: Sequence[int], deck: np.ndarray, runout_size: int) -> int:
+    # Upper bound of the hands class_showdown_counts evaluates, to choose it over concrete enumeration
+    classes_num = int(card_classes(board_codes, deck, runout_size).max()) + 1
+    runouts_num = comb(classes_num + runout_size - 1, runout_size)
+    return runouts_num * comb(classes_num + 1, 2)
+
+
+def class_showdown_counts(board_codes: Sequence[int], deck: np.ndarray, runouts: np.ndarray,
+                          my_strengths: np.ndarray) -> ClassCounts:
+    # Heads-up counts per runout from class representatives: runouts of one class multiset get the
+    # same counts, and each opponent pocket class is evaluated once with its number of concrete pockets
+    board_codes = np.asarray(board_codes, dtype=np.uint8)
+    runout_size = runouts.shape[1]
+    class_ids = card_classes(board_codes, deck, runout_size)
+    classes_num = int(class_ids.max()) + 1
+    sizes = np.bincount(class_ids, minlength=classes_num)
+    members: List[List[int]] = [list() for _ in range(classes_num)]
+    for code, class_id in zip(deck.tolist(), class_ids.tolist()):
+        members[class_id].append(code)
+    member_cards = np.zeros((classes_num, sizes.max() + 1), dtype=np.uint8)
+    for class_id, codes in enumerate(members):
+        member_cards[class_id, :len(codes)] = codes
+
+    # Runout classes that occur, with one concrete runout each and the class of every runout
+    deck_positions = np.zeros(int(deck.max()) + 1, dtype=np.intp)
+    deck_positions[deck] = np.arange(len(deck))
+    runout_classes = np.sort(class_ids[deck_positions[runouts]], axis=1)
+    runout_multisets, representatives, runout_class_ids = np.unique(runout_classes, axis=0, return_index=True,
+                                                                    return_inverse=True)
+    runout_class_ids = runout_class_ids.reshape(-1)
+    used = np.zeros((len(runout_multisets), classes_num), dtype=np.int64)
+    for column in runout_multisets.T:
+        np.add.at(used, (np.arange(len(runout_multisets)), column), 1)
+
+    # Representative runouts take the first members of their classes and opponent pockets the next
+    # ones, weighted by the concrete pockets left; our strength is the same on every runout of a class
+    rep_runouts = np.empty(runout_multisets.shape, dtype=np.uint8)
+    for position in range(runout_size):
+        repeats = (runout_multisets[:, :position] == runout_multisets[:, position:position + 1]).sum(axis=1)
+        rep_runouts[:, position] = member_cards[runout_multisets[:, position], repeats]
+    pocket_multisets = class_multisets(classes_num, 2)
+    weights = multiset_weights(pocket_multisets, sizes[None, :] - used)
+    runout_ids, pocket_ids = np.nonzero(weights)
+    first, second = pocket_multisets[pocket_ids, 0], pocket_multisets[pocket_ids, 1]
+    hands = np.empty((len(runout_ids), runout_size + 2), dtype=np.uint8)
+    hands[:, :runout_size] = rep_runouts[runout_ids]
+    hands[:, runout_size] = member_cards[first, used[runout_ids, first]]
+    hands[:, runout_size + 1] = member_cards[second, used[runout_ids, second] + (first == second)]
+    opp_strengths = evaluate_strengths_array(hands, evaluation_state(board_codes))
+    pair_weights = weights[runout_ids, pocket_ids]
+    class_strengths = my_strengths[representatives][runout_ids]
+
+    classes_runouts_num = len(runout_multisets)
+    wins = np.bincount(runout_ids, pair_weights * (opp_strengths < class_strengths), classes_runouts_num)
+    ties = np.bincount(runout_ids, pair_weights * (opp_strengths == class_strengths), classes_runouts_num)
+    losses = np.bincount(runout_ids, pair_weights * (opp_strengths > class_strengths), classes_runouts_num)
+    categories_num = HIGH_CARD + 1
+    category_counts = np.bincount(runout_ids * categories_num + strengths_categories(opp_strengths), pair_weights,
+                                  classes_runouts_num * categories_num).reshape(classes_runouts_num, categories_num)
+    return (np.rint(wins[runout_class_ids]).astype(np.int64), np.rint(ties[runout_class_ids]).astype(np.int64),
+            np.rint(losses[runout_class_ids]).astype(np.int64),
+            np.rint(category_counts[runout_class_ids]).astype(np.int64))
@@ -0,0 +1,118 @@
+from functools import lru_cache
+from itertools import combinations
+from math import comb
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from .evaluator import (RANKS_NUM, ROYAL_FLUSH, STRAIGHT_FLUSH, FOUR_OF_A_KIND, FULL_HOUSE, FLUSH, STRAIGHT,
+                        THREE_OF_A_KIND, TWO_PAIR, PAIR, HIGH_CARD, category_strength,
+                        _CATEGORY_SHIFT, _MAJOR_SHIFT, _MINOR_SHIFT, _MASKS_NUM, _POPCOUNT, _STRAIGHT_HIGH, _TOP_BITS)
+
+_POPCOUNT_ARR = np.array(_POPCOUNT, dtype=np.int32)
+_STRAIGHT_HIGH_ARR = np.array(_STRAIGHT_HIGH, dtype=np.int32)
+_TOP_BITS_ARR = [np.array(table, dtype=np.int32) for table in _TOP_BITS]
+_HIGH_BIT_ARR = np.array([max(mask.bit_length() - 1, 0) for mask in range(_MASKS_NUM)], dtype=np.int32)
+_RANK_MASK = (1 << RANKS_NUM) - 1
+
+# Evaluation state of a set of cards: rank multiplicity masks m1..m4 and per-suit rank masks packed
+# into 16-bit lanes, as evaluate_strengths_array builds them
+EvaluationState = Tuple[int, int, int, int, int]
+EMPTY_STATE: EvaluationState = (0, 0, 0, 0, 0)
+
+
+@lru_cache(maxsize=None)
+def combinations_array(n: int, k: int) -> np.ndarray:
+    # Lexicographic k-subsets of range(n) as an (C(n, k), k) index array, shared between calls
+    arr = np.array(list(combinations(range(n), k)), dtype=np.uint8).reshape(comb(n, k), k)
+    arr.flags.writeable = False
+    return arr
+
+
+def evaluation_state(codes: Sequence[int], state: EvaluationState = EMPTY_STATE) -> EvaluationState:
+    # State of the fixed cards of many hands (a board, or a board and a pocket), computed once so that
+    # evaluating the hands only folds in the cards that vary between them
+    m1, m2, m3, m4, suit_masks = state
+    for code in map(int, codes):
+        bit = 1 << (code >> 2)
+        m4 |= bit & m3
+        m3 |= bit & m2
+        m2 |= bit & m1
+        m1 |= bit
+        suit_masks |= 1 << ((code & 3) * 16 + (code >> 2))
+    return m1, m2, m3, m4, suit_masks
+
+
+def evaluate_strengths_array(hands: np.ndarray, state: EvaluationState = EMPTY_STATE) -> np.ndarray:
+    # With a state, hands hold only the cards added to the state's cards, 7 in total
+    hands = np.asarray(hands, dtype=np.uint8)
+    hands_num = hands.shape[0]
+    m1 = np.full(hands_num, state[0], dtype=np.int32)
+    m2 = np.full(hands_num, state[1], dtype=np.int32)
+    m3 = np.full(hands_num, state[2], dtype=np.int32)
+    m4 = np.full(hands_num, state[3], dtype=np.int32)
+    suit_masks = np.full(hands_num, state[4], dtype=np.int64)
+    # Same multiplicity masks as evaluate_strength, updated column by column without branches;
+    # per-suit rank masks are packed into 16-bit lanes of one int64
+    for column in hands.T:
+        ranks = (column >> 2).astype(np.int32)
+        bit = np.left_shift(1, ranks)
+        m4 |= bit & m3
+        m3 |= bit & m2
+        m2 |= bit & m1
+        m1 |= bit
+        suit_masks |= np.left_shift(np.int64(1), (column & 3).astype(np.int64) * 16 + ranks)
+
+    flush_mask = np.zeros(hands_num, dtype=np.int32)
+    for suit in range(4):
+        suit_mask = ((suit_masks >> (16 * suit)) & _RANK_MASK).astype(np.int32)
+        flush_mask |= np.where(_POPCOUNT_ARR[suit_mask] >= 5, suit_mask, 0)
+
+    strengths = category_strength(HIGH_CARD) | _TOP_BITS_ARR[5][m1]
+
+    major = _HIGH_BIT_ARR[m2]
+    pair = category_strength(PAIR) | major << _MAJOR_SHIFT | _TOP_BITS_ARR[3][m1 & ~m2]
+    strengths = np.where(m2 != 0, pair, strengths)
+
+    pairs = _TOP_BITS_ARR[2][m2]
+    major = _HIGH_BIT_ARR[pairs]
+    minor = _HIGH_BIT_ARR[pairs & ~np.left_shift(1, major)]
+    two_pair = (category_strength(TWO_PAIR) | major << _MAJOR_SHIFT | minor << _MINOR_SHIFT |
+                _TOP_BITS_ARR[1][m1 & ~pairs])
+    strengths = np.where(_POPCOUNT_ARR[m2] >= 2, two_pair, strengths)
+
+    trips_major = _HIGH_BIT_ARR[m3]
+    trips_bit = np.left_shift(1, trips_major)
+    trips = category_strength(THREE_OF_A_KIND) | trips_major << _MAJOR_SHIFT | _TOP_BITS_ARR[2][m1 & ~trips_bit]
+    strengths = np.where(m3 != 0, trips, strengths)
+
+    straight_high = _STRAIGHT_HIGH_ARR[m1]
+    straight = category_strength(STRAIGHT) | (straight_high - 1) << _MAJOR_SHIFT
+    strengths = np.where(straight_high != 0, straight, strengths)
+
+    flush = category_strength(FLUSH) | _TOP_BITS_ARR[5][flush_mask]
+    strengths = np.where(flush_mask != 0, flush, strengths)
+
+    full_house_pairs = m2 & ~trips_bit
+    full_house = (category_strength(FULL_HOUSE) | trips_major << _MAJOR_SHIFT |
+                  _HIGH_BIT_ARR[full_house_pairs] << _MINOR_SHIFT)
+    strengths = np.where((m3 != 0) & (full_house_pairs != 0), full_house, strengths)
+
+    quads_major = _HIGH_BIT_ARR[m4]
+    quads = (category_strength(FOUR_OF_A_KIND) | quads_major << _MAJOR_SHIFT |
+             _TOP_BITS_ARR[1][m1 & ~np.left_shift(1, quads_major)])
+    strengths = np.where(m4 != 0, quads, strengths)
+
+    straight_flush_high = _STRAIGHT_HIGH_ARR[flush_mask]
+    straight_flush = category_strength(STRAIGHT_FLUSH) | (straight_flush_high - 1) << _MAJOR_SHIFT
+    strengths = np.where(straight_flush_high != 0, straight_flush, strengths)
+    strengths = np.where(straight_flush_high == RANKS_NUM, category_strength(ROYAL_FLUSH), strengths)
+    return strengths
+
+
+def strengths_categories(strengths: np.ndarray) -> np.ndarray:
+    return HIGH_CARD - (np.asarray(strengths) >> _CATEGORY_SHIFT)
+
+
+def evaluate_categories_array(hands: np.ndarray) -> np.ndarray:
+    return strengths_categories(evaluate_strengths_array(hands))
@@ -0,0 +1,39 @@
+import io
+import json
+
+from poker.batch import parse_hand, read_hands, run
+from poker.executor import Executor
+
+LINES = ['{"id": "a", "pocket": "Ah Kd", "board": "2c 7d Jh", "opponents": 2}',
+         '{"id": "b", "pocket": "Ah Ah"}',
+         'not json',
+         '[1, 2]',
+         '{"id": "c", "pocket": "Qd 4c", "opponents": 0}',
+         '{"pocket": ["Qd", "4c"]}']
+
+
+def test_bad_lines_become_error_rows():
+    hands = list(read_hands(io.StringIO('\n'.join(LINES)), 'jsonl'))
+    assert [hand[0] for hand in hands] == ['a', 'b', '3', '4', 'c', '6']
+    assert [len(hand) for hand in hands] == [4, 2, 2, 2, 2, 4]
+    assert 'Line 5' in hands[4][1]
+
+
+def test_bad_line_does_not_stop_the_run():
+    output = io.StringIO()
+    with Executor('serial') as executor:
+        stats = run(io.StringIO('\n'.join(LINES)), output, 'jsonl', 'jsonl', executor, batch_size=2, log=None)
+    rows = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert stats['hands'] == len(LINES) and stats['errors'] == 4
+    assert [row['id'] for row in rows] == ['a', 'b', '3', '4', 'c', '6']
+    assert rows[0]['flop'] is not None and rows[0]['error'] is None
+    assert rows[5]['pre_flop'] is not None and rows[5]['error'] is None
+    assert all(row['error'] and row['pre_flop'] is None for row in rows[1:5])
+
+
+def test_csv_bad_row():
+    text = 'id,pocket,board,opponents\n1,Ah Kd,,\n2,Ah,,\n3,Qd 4c,,2.5\n4,Qd 4c,2h Qh 4h,3\n'
+    hands = list(read_hands(io.StringIO(text), 'csv'))
+    assert [len(hand) for hand in hands] == [4, 2, 2, 4]
+    assert hands[0] == parse_hand({'pocket': 'Ah Kd'}, '1')
+    assert hands[3][3] == 3
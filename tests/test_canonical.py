@@ -0,0 +1,79 @@
+import itertools
+import random
+
+from poker.canonical import ResultCache, canonical_form, canonical_key
+
+
+def relabel(codes, perm):
+    return tuple((code & ~3) | perm[code & 3] for code in codes)
+
+
+def test_suit_relabelings_share_a_key():
+    rnd = random.Random(0)
+    for _ in range(200):
+        codes = rnd.sample(range(52), 7)
+        pocket, board = codes[:2], codes[2:2 + rnd.choice((0, 3, 4, 5))]
+        key = canonical_key(pocket, board)
+        for perm in itertools.permutations(range(4)):
+            assert canonical_key(relabel(pocket, perm), relabel(board, perm)) == key
+
+
+def test_pocket_and_flop_order_do_not_matter():
+    key = canonical_key((48, 13), (0, 21, 34, 40, 7))
+    for flop in itertools.permutations((0, 21, 34)):
+        assert canonical_key((13, 48), flop + (40, 7)) == key
+
+
+def test_turn_and_river_keep_their_street():
+    assert canonical_key((48, 13), (0, 21, 34, 40, 7)) != canonical_key((48, 13), (0, 21, 34, 7, 40))
+    # A turn card is not a flop card
+    assert canonical_key((48, 13), (0, 21, 34, 40)) != canonical_key((48, 13), (0, 21, 40, 34))
+
+
+def test_different_spots_get_different_keys():
+    # Same ranks, but suited against offsuit
+    assert canonical_key((48, 44), (0, 21, 34)) != canonical_key((48, 45), (0, 21, 34))
+    # Same pocket and board ranks, but the board pairs a suit with the pocket
+    assert canonical_key((48, 44), (0, 21, 34)) != canonical_key((48, 44), (0, 21, 32))
+    # The pocket cards are not interchangeable with the board cards
+    assert canonical_key((0, 21), (48, 44, 34)) != canonical_key((48, 44), (0, 21, 34))
+
+
+def test_canonical_form_gives_the_relabeling():
+    rnd = random.Random(1)
+    for _ in range(100):
+        codes = rnd.sample(range(52), 7)
+        key, perm = canonical_form(codes[:2], codes[2:])
+        pocket, board = relabel(codes[:2], perm), relabel(codes[2:], perm)
+        assert key == (tuple(sorted(pocket)), tuple(sorted(board[:3])), board[3:])
+        assert key == canonical_key(codes[:2], codes[2:])
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ResultCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert len(cache) == 2
+
+
+def test_cache_counts_hits_and_misses():
+    cache = ResultCache()
+    cache.put('a', 1)
+    cache.get('a')
+    cache.get('a')
+    cache.get('b')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (2, 1, 1)
+    assert stats['hit_rate'] == 2 / 3
+    cache.clear()
+    assert (cache.hits, cache.misses, len(cache)) == (0, 0, 0)
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ResultCache(0)
+    cache.put('a', 1)
+    assert cache.get('a') is None and len(cache) == 0
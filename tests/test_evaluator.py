@@ -0,0 +1,95 @@
+from collections import Counter
+import random
+
+import numpy as np
+import pytest
+
+from poker.combinations import (has_flush, has_four_of_a_kind, has_full_house, has_pair, has_royal_flush,
+                                has_straight, has_straight_flush, has_three_of_a_kind, has_two_pair)
+from poker.evaluator import (FLUSH, FULL_HOUSE, HIGH_CARD, PAIR, STRAIGHT, THREE_OF_A_KIND, TWO_PAIR, code_card,
+                             evaluate_category, evaluate_strength)
+from poker.objects import Card
+from poker.vectorized import evaluate_categories_array, evaluate_strengths_array, evaluation_state
+
+BASELINE_CHECKS = (has_royal_flush, has_straight_flush, has_four_of_a_kind, has_full_house, has_flush, has_straight,
+                   has_three_of_a_kind, has_two_pair, has_pair)
+
+
+def baseline_category(codes):
+    # The original category chain: the first matching check, in category order
+    cards = [code_card(code) for code in codes]
+    for category, check in enumerate(BASELINE_CHECKS):
+        if check(all_cards=cards):
+            return category
+    return HIGH_CARD
+
+
+def two_trips(codes):
+    # The original has_full_house wants a trips and a pair, so it calls two trips THREE_OF_A_KIND
+    return sorted(Counter(code >> 2 for code in codes).values())[-2:] == [3, 3]
+
+
+def random_hands(hands_num, seed=0):
+    rnd = random.Random(seed)
+    return [rnd.sample(range(52), 7) for _ in range(hands_num)]
+
+
+def hand(text):
+    return [Card.from_str(card).code for card in text.split()]
+
+
+def test_categories_match_baseline_chain():
+    for codes in random_hands(20000):
+        if not two_trips(codes):
+            assert evaluate_category(codes) == baseline_category(codes), codes
+
+
+def test_two_trips_are_a_full_house():
+    codes = hand('9h 9c 9d Ts Th Tc 3d')
+    assert baseline_category(codes) == THREE_OF_A_KIND
+    assert evaluate_category(codes) == FULL_HOUSE
+    assert evaluate_strength(codes) > evaluate_strength(hand('9h 9c 9d Ts Th 2c 3d'))
+
+
+@pytest.mark.parametrize('text, category', [
+    ('Ah Kh Qh Jh Th 2c 3d', 0),
+    ('9h Kh Qh Jh Th 2c 3d', 1),
+    ('9h 9c 9d 9s Th 2c 3d', 2),
+    ('9h 9c 9d Ts Th 2c 3d', FULL_HOUSE),
+    ('2h 9h 4h Jh Th 2c 3d', FLUSH),
+    ('Ah 2c 3d 4s 5h 9c Kd', STRAIGHT),
+    ('Ah Ac 3d 3s 5h 5c Kd', TWO_PAIR),
+    ('Ah Ac 3d 7s 9h Jc Kd', PAIR),
+])
+def test_known_categories(text, category):
+    assert evaluate_category(hand(text)) == category == baseline_category(hand(text))
+
+
+@pytest.mark.parametrize('stronger, weaker', [
+    ('Ah Kd Qc Qs 7h 5d 2c', 'Ah Jd Qc Qs 7h 5d 2c'),   # kicker
+    ('6h 5d 4c 3s 2h Ad 9c', 'Ah Kd Qc Js 9h 5d 2c'),   # straight over high card
+    ('Kh Kd Kc 2s 2h 5d 9c', 'Qh Qd Qc As Ah 5d 9c'),   # full house by trips rank
+    ('Ah Ad Kc Ks 3h 3d 4c', 'Ah Ad Kc Ks 2h 2d 3c'),   # third pair only counts as a kicker
+])
+def test_strength_order(stronger, weaker):
+    assert evaluate_strength(hand(stronger)) > evaluate_strength(hand(weaker))
+
+
+def test_equal_strength_for_split_pots():
+    assert evaluate_strength(hand('Ah Kd 2c 3s 4h 5d 9c')) == evaluate_strength(hand('As Kc 2c 3s 4h 5d 9c'))
+
+
+def test_array_evaluator_matches_scalar():
+    hands = np.array(random_hands(5000, seed=1), dtype=np.uint8)
+    strengths = evaluate_strengths_array(hands)
+    assert strengths.tolist() == [evaluate_strength(codes) for codes in hands.tolist()]
+    assert evaluate_categories_array(hands).tolist() == [evaluate_category(codes) for codes in hands.tolist()]
+
+
+@pytest.mark.parametrize('fixed_num', range(8))
+def test_evaluation_state_matches_full_hands(fixed_num):
+    hands = np.array(random_hands(500, seed=2), dtype=np.uint8)
+    expected = evaluate_strengths_array(hands)
+    for codes, strength in zip(hands, expected):
+        state = evaluation_state(codes[:fixed_num])
+        assert evaluate_strengths_array(codes[None, fixed_num:], state)[0] == strength
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from poker.flops import FlopTable, canonical_flop, flop_counts, save_flop_table
+from poker.ranges import COMBO_INDEX
+from poker.showdown import CATEGORIES_NUM, RunoutShowdown
+
+# Canonical flops of different textures: rainbow, monotone, paired
+FLOPS = [(0, 21, 34), (0, 16, 40), (0, 1, 44)]
+POCKETS = [(51, 50), (48, 13), (4, 29)]
+
+
+@pytest.fixture(scope='module')
+def table_path(tmp_path_factory):
+    flops = np.array(FLOPS, dtype=np.uint8)
+    wins, ties, categories = (np.array(part) for part in zip(*(flop_counts(flop) for flop in FLOPS)))
+    path = str(tmp_path_factory.mktemp('flops') / 'flop_equity.bin')
+    save_flop_table(flops, wins, ties, categories, path)
+    return path
+
+
+def relabel(codes, perm):
+    return tuple((code & ~3) | perm[code & 3] for code in codes)
+
+
+def test_canonical_flop_is_suit_invariant():
+    flop, perm = canonical_flop((45, 6, 19))
+    assert canonical_flop(relabel((45, 6, 19), (2, 0, 3, 1)))[0] == flop
+    assert tuple(sorted(relabel((45, 6, 19), perm))) == flop
+
+
+@pytest.mark.parametrize('flop', FLOPS)
+def test_flop_counts_match_runout_showdown(flop):
+    wins, ties, categories = flop_counts(flop)
+    for pocket in POCKETS:
+        showdown = RunoutShowdown.compute(pocket, flop, card_counts=False)
+        combo = COMBO_INDEX[pocket[0], pocket[1]]
+        assert wins[combo] == showdown.wins.sum()
+        assert ties[combo] == showdown.ties.sum()
+    assert len(categories) == CATEGORIES_NUM
+
+
+@pytest.mark.parametrize('flop', FLOPS)
+@pytest.mark.parametrize('perm', [(0, 1, 2, 3), (3, 1, 0, 2)])
+def test_table_matches_runout_showdown(table_path, flop, perm):
+    table = FlopTable(table_path)
+    flop = relabel(flop, perm)
+    for pocket in POCKETS:
+        pocket = relabel(pocket, perm)
+        showdown = RunoutShowdown.compute(pocket, flop, card_counts=False)
+        result_dict = table.result_dict(pocket, flop)
+        assert np.allclose([result_dict['win'], result_dict['tie'], result_dict['loss']], showdown.probs())
+        assert np.allclose(result_dict['my_probs'], showdown.my_probs())
+        assert np.allclose(result_dict['opponent_probs'], showdown.opponent_probs())
+
+
+def test_table_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        FlopTable(str(path))
@@ -0,0 +1,72 @@
+import numpy as np
+
+from poker import game_stages
+from poker.canonical import ResultCache
+from poker.executor import Executor
+from poker.game_stages import MIN_SHARED_POCKETS, STREET_KEYS, STREET_METHODS, Game
+from poker.objects import ALL_CARDS_BY_CODE, Pocket, Table
+
+SHARED_BOARD = (0, 21, 34, 40)
+
+
+def query(pocket_codes, board_codes, *opponents_num):
+    return (Pocket([ALL_CARDS_BY_CODE[code] for code in pocket_codes]),
+            Table([ALL_CARDS_BY_CODE[code] for code in board_codes])) + opponents_num
+
+
+def queries():
+    # Heads-up pockets on one board, enough for a board pass, and single queries of every other kind
+    deck = [code for code in range(52) if code not in SHARED_BOARD]
+    shared = [query(deck[2 * idx:2 * idx + 2], SHARED_BOARD, 1) for idx in range(MIN_SHARED_POCKETS + 2)]
+    singles = [query((48, 49), (), 3),
+               query((48, 49), (0, 21, 34), 1),
+               query((51, 38), (2, 18, 22, 33, 44), 1),
+               query((12, 13), (1, 5, 9), 2),
+               query((45, 50), (0, 16, 40, 41))]
+    return shared[:4] + singles + shared[4:]
+
+
+def game_result(pocket, table, opponents_num=8):
+    game = Game(pocket, table, opponents_num, Executor('serial'), ResultCache())
+    return getattr(game, STREET_METHODS[len(table.codes)])()
+
+
+def test_process_many_matches_game(monkeypatch):
+    boards = list()
+    original = game_stages.board_results
+
+    def board_results(args):
+        boards.append(args[0])
+        return original(args)
+
+    monkeypatch.setattr('poker.game_stages.board_results', board_results)
+    results = Game.process_many(queries(), Executor('serial'), ResultCache())
+    # Only the shared board goes through a board pass
+    assert boards == [SHARED_BOARD]
+    for item, result in zip(queries(), results):
+        expected = game_result(*item)
+        assert set(result) == set(expected) == set(STREET_KEYS)
+        for key in STREET_KEYS:
+            assert np.allclose(result[key], expected[key]), key
+
+
+def test_process_many_uses_the_cache():
+    cache = ResultCache()
+    first = Game.process_many(queries(), Executor('serial'), cache)
+    hits = cache.hits
+    second = Game.process_many(queries(), Executor('serial'), cache)
+    # Every street query is answered from the cache on the second call, the pre-flop one is not cached
+    assert cache.hits - hits == len(queries()) - 1
+    assert second == first
+    # Results are copies, so callers cannot change the cached ones
+    second[0]['my_probs'][0] = -1
+    assert Game.process_many(queries()[:1], Executor('serial'), cache)[0] == first[0]
+
+
+def test_process_many_shares_the_cache_with_game():
+    cache = ResultCache()
+    pocket, table, opponents_num = queries()[0]
+    Game.process_many(queries(), Executor('serial'), cache)
+    hits = cache.hits
+    Game(pocket, table, opponents_num, Executor('serial'), cache).process_turn()
+    assert cache.hits == hits + 1
@@ -0,0 +1,53 @@
+import pytest
+
+from poker.executor import Executor
+from poker.monte_carlo import PROBE_BATCH, MonteCarloEquity
+from poker.showdown import RunoutShowdown
+
+
+def estimate(seed=1, batch_size=2000, **kwargs):
+    return MonteCarloEquity(Executor('serial'), seed, batch_size).estimate((48, 49), (0, 21, 34, 40), 2, **kwargs)
+
+
+def without_time(result):
+    return {key: value for key, value in result.items() if key != 'elapsed'}
+
+
+def test_same_seed_gives_the_same_result():
+    assert without_time(estimate(target_stderr=0.01)) == without_time(estimate(target_stderr=0.01))
+    assert estimate(target_stderr=0.01)['win_prob'] != estimate(seed=2, target_stderr=0.01)['win_prob']
+
+
+def test_stops_at_target_stderr():
+    result = estimate(batch_size=500, target_stderr=0.005)
+    assert result['converged'] and result['stderr'] <= 0.005 and result['samples'] > 500
+    # It stops at the first round that reaches the target
+    previous = estimate(batch_size=500, target_stderr=0.005, max_samples=result['samples'] - 500)
+    assert previous['samples'] == result['samples'] - 500 and previous['stderr'] > 0.005
+
+
+def test_stops_at_max_samples():
+    result = estimate(target_stderr=1e-6, max_samples=6000)
+    assert result['samples'] == 6000 and not result['converged']
+
+
+def test_estimate_matches_enumeration():
+    result = estimate(target_stderr=0.005)
+    exact = RunoutShowdown.compute((48, 49), (0, 21, 34, 40)).equity(2)
+    assert abs(result['win_prob'] - exact) < 4 * result['stderr']
+    low, high = result['confidence_interval']
+    assert low <= result['win_prob'] <= high
+
+
+def test_time_budget_runs_a_probe_first():
+    result = estimate(target_stderr=1e-6, time_budget=1e-6)
+    assert result['samples'] == PROBE_BATCH
+    # With a budget that fits more rounds, full batches follow the probe
+    result = estimate(target_stderr=1e-6, time_budget=0.5, max_samples=PROBE_BATCH + 4000)
+    assert (result['samples'] - PROBE_BATCH) % 2000 == 0
+
+
+@pytest.mark.parametrize('time_budget', [0, -1.])
+def test_time_budget_must_be_positive(time_budget):
+    with pytest.raises(ValueError):
+        estimate(time_budget=time_budget)
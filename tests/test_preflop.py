@@ -0,0 +1,22 @@
+import pytest
+
+from poker.game_stages import MAX_OPPONENTS_NUM
+from poker.preflop import MAX_OPPONENTS, STARTING_HANDS_NUM, preflop_equity, starting_hand_codes, starting_hand_index
+
+
+def test_starting_hand_index_round_trip():
+    for index in range(STARTING_HANDS_NUM):
+        assert starting_hand_index(starting_hand_codes(index)) == index
+
+
+def test_table_covers_every_opponents_number():
+    assert MAX_OPPONENTS == MAX_OPPONENTS_NUM
+    equities = [preflop_equity((48, 49), opponents_num) for opponents_num in range(1, MAX_OPPONENTS + 1)]
+    assert all(earlier > later for earlier, later in zip(equities, equities[1:]))
+    assert 0.84 < equities[0] < 0.86
+
+
+@pytest.mark.parametrize('opponents_num', [0, MAX_OPPONENTS + 1])
+def test_opponents_outside_the_table_are_rejected(opponents_num):
+    with pytest.raises(ValueError):
+        preflop_equity((48, 49), opponents_num)
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from poker.ranges import COMBOS, HandRange, RangeShowdown, range_equity
+from poker.showdown import RunoutShowdown
+
+
+def class_combos(hand_range):
+    # Combos as rank/suited hand classes, e.g. {'AKs': 4, 'AKo': 12}
+    classes = dict()
+    for (first, second), _ in hand_range.combos():
+        high, low = sorted((first >> 2, second >> 2), reverse=True)
+        name = '23456789TJQKA'[high] + '23456789TJQKA'[low]
+        if high != low:
+            name += 's' if first & 3 == second & 3 else 'o'
+        classes[name] = classes.get(name, 0) + 1
+    return classes
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('AA', {'AA': 6}),
+    ('AKs', {'AKs': 4}),
+    ('AKo', {'AKo': 12}),
+    ('AK', {'AKs': 4, 'AKo': 12}),
+    ('KA', {'AKs': 4, 'AKo': 12}),
+    ('QQ+', {'QQ': 6, 'KK': 6, 'AA': 6}),
+    ('ATs+', {'ATs': 4, 'AJs': 4, 'AQs': 4, 'AKs': 4}),
+    ('AKs-AJs', {'AJs': 4, 'AQs': 4, 'AKs': 4}),
+    ('99-77', {'99': 6, '88': 6, '77': 6}),
+    ('98s-76s', {'98s': 4, '87s': 4, '76s': 4}),
+    ('AhKh', {'AKs': 1}),
+])
+def test_parse_hand_classes(text, expected):
+    assert class_combos(HandRange.parse(text)) == expected
+
+
+def test_parse_weights():
+    hand_range = HandRange.parse('QQ+, AKo:0.5, AhKh:0.25')
+    weights = dict(hand_range.combos())
+    assert len(hand_range) == 18 + 12 + 1
+    assert weights[(48, 49)] == 1
+    assert weights[(47, 50)] == 0.5
+    assert weights[(46, 50)] == 0.25
+
+
+def test_later_items_override_earlier_ones():
+    hand_range = HandRange.parse('AK, AKs:0')
+    assert class_combos(hand_range) == {'AKo': 12}
+    assert len(HandRange.parse('AA:0.5, AsAh')) == 6
+    assert dict(HandRange.parse('AA:0.5, AsAh').combos())[(50, 51)] == 1
+
+
+@pytest.mark.parametrize('text', ['AAs', 'AX', 'AKs-QJo', 'AKs-T9s-', 'AhAh', 'AA:-1'])
+def test_parse_rejects_invalid_ranges(text):
+    with pytest.raises(ValueError):
+        HandRange.parse(text)
+
+
+def test_full_range_matches_runout_showdown():
+    pocket, board = (48, 49), (0, 21, 34)
+    result = range_equity(HandRange.from_pocket(pocket), HandRange.full(), board)
+    assert np.allclose([result['win'], result['tie'], result['loss']], RunoutShowdown.compute(pocket, board).probs())
+
+
+def test_weights_scale_the_matchups():
+    # A combo with weight 2 counts as two copies of it
+    board = (0, 21, 34, 40)
+    opp_range = HandRange.parse('AA, KK:2')
+    showdown = RangeShowdown.compute(HandRange.from_pocket((44, 45)), opp_range, board)
+    aces = RangeShowdown.compute(HandRange.from_pocket((44, 45)), HandRange.parse('AA'), board)
+    kings = RangeShowdown.compute(HandRange.from_pocket((44, 45)), HandRange.parse('KK'), board)
+    assert np.allclose(showdown.wins, aces.wins + 2 * kings.wins)
+    assert np.allclose(showdown.totals, aces.totals + 2 * kings.totals)
+
+
+def test_combos_are_sorted_pairs():
+    assert all(first < second for (first, second), _ in HandRange.full().combos())
+    assert len(HandRange.full()) == len(COMBOS)
@@ -0,0 +1,80 @@
+from itertools import combinations
+from math import comb
+
+import numpy as np
+import pytest
+
+from poker.enumeration import chunk_descriptors, generate_chunk, rank_combinations_array
+from poker.objects import ALL_CARDS_BY_CODE, BitDeck, Card, Deck
+from poker.ranking import rank_combination, unrank_combination
+from poker.vectorized import combinations_array
+
+
+@pytest.mark.parametrize('n, k', [(5, 0), (5, 1), (7, 3), (10, 5), (12, 12)])
+def test_rank_unrank_round_trip(n, k):
+    for rank, indices in enumerate(combinations(range(n), k)):
+        assert rank_combination(indices, n) == rank
+        assert unrank_combination(rank, n, k) == indices
+
+
+def test_large_ranks_round_trip():
+    n, k = 52, 5
+    for rank in (0, 1, 12345, 1000000, comb(n, k) - 1):
+        assert rank_combination(unrank_combination(rank, n, k), n) == rank
+
+
+@pytest.mark.parametrize('n, k', [(9, 0), (9, 2), (20, 4), (47, 2)])
+def test_rank_combinations_array(n, k):
+    subsets = combinations_array(n, k)
+    assert rank_combinations_array(subsets, n).tolist() == list(range(comb(n, k)))
+
+
+@pytest.mark.parametrize('n, k, chunk_size', [(10, 3, 7), (20, 4, 100), (47, 2, 50), (8, 0, 1)])
+def test_chunks_cover_the_enumeration(n, k, chunk_size):
+    chunks = [generate_chunk(descriptor) for descriptor in chunk_descriptors(n, k, chunk_size)]
+    assert np.array_equal(np.concatenate(chunks), combinations_array(n, k))
+
+
+def test_bit_deck_matches_deck():
+    removed = {Card.from_str(text) for text in ('Ah', 'Kd', '2c', '7s')}
+    deck, bit_deck = Deck(), BitDeck()
+    deck.get_cards(set(removed))
+    bit_deck.get_cards(set(removed))
+    assert bit_deck.codes == deck.codes
+    assert bit_deck.cards == deck.cards
+    assert BitDeck(deck.cards).codes == deck.codes
+    assert len(bit_deck) == 48 and removed.isdisjoint(bit_deck.cards)
+    assert {tuple(sorted(card.code for card in cards)) for cards in bit_deck.get_combinations(2)} == \
+        {tuple(sorted(card.code for card in cards)) for cards in deck.get_combinations(2)}
+
+
+def test_bit_deck_cards_are_read_only():
+    deck = BitDeck()
+    assert isinstance(deck.cards, frozenset)
+    deck.get_card_by_sv(14, 0)
+    assert len(deck.cards) == 51
+
+
+def test_bit_deck_combination_index_round_trip():
+    deck = BitDeck({ALL_CARDS_BY_CODE[code] for code in range(0, 52, 3)})
+    codes = deck.codes
+    for index, positions in enumerate(combinations(range(len(codes)), 3)):
+        cards = deck.get_combination(index, 3)
+        assert [card.code for card in cards] == [codes[position] for position in positions]
+        assert deck.get_combination_index(cards) == index
+
+
+@pytest.mark.parametrize('size', [0, 1, 3, 5])
+def test_bit_deck_enumeration_follows_the_ranking(size):
+    deck = BitDeck({ALL_CARDS_BY_CODE[code] for code in range(0, 52, 4)})
+    for index, cards in enumerate(deck.iter_combinations(size)):
+        assert deck.get_combination_index(cards) == index
+    assert index == comb(len(deck), size) - 1
+
+
+def test_bit_deck_enumeration_ranges():
+    deck = BitDeck({ALL_CARDS_BY_CODE[code] for code in range(0, 52, 3)})
+    masks = list(deck.iter_masks(4))
+    for start, stop in [(0, 1), (5, 40), (100, 10 ** 6), (len(masks) - 1, None), (50, 50)]:
+        assert list(deck.iter_masks(4, start, stop)) == masks[start:stop]
+    assert list(deck.iter_masks(20)) == []
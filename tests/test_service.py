@@ -0,0 +1,52 @@
+import asyncio
+
+from poker.executor import Executor
+from poker.service import DEADLINE_EXCEEDED, EquityClient, EquityServer
+
+
+async def serve_and_query(executor, queries):
+    # Starts the server on a free local port and sends every (args, kwargs) query concurrently
+    server = EquityServer(executor)
+    listener = await server.start(port=0)
+    client = await EquityClient.connect(port=listener.sockets[0].getsockname()[1])
+    try:
+        responses = await asyncio.gather(*(client.query(*args, **kwargs) for args, kwargs in queries))
+        # A later query of a finished spot comes from the cache
+        cached = await client.query(*queries[0][0])
+    finally:
+        await client.close()
+        listener.close()
+        await listener.wait_closed()
+    return server, responses, cached
+
+
+def test_identical_queries_are_coalesced():
+    flop = (['Ah', 'Kd'], ['2c', '7d', 'Jh'], 3)
+    # The same spot with hearts and spades swapped
+    relabeled = (['As', 'Kd'], ['2c', '7d', 'Js'], 3)
+    with Executor('thread', 2) as executor:
+        server, responses, cached = asyncio.run(serve_and_query(executor, [(flop, {}), (flop, {}),
+                                                                           (relabeled, {})]))
+    assert [response['coalesced'] for response in responses] == [False, True, True]
+    assert len({response['win_prob'] for response in responses}) == 1
+    assert cached['coalesced'] and cached['win_prob'] == responses[0]['win_prob']
+    assert server.computed == 1 and server.coalesced == 2
+
+
+def test_expired_deadline_is_reported():
+    turn = (['Qd', '4c'], ['2h', 'Qh', '4h', '7h'], 4)
+    with Executor('thread', 1) as executor:
+        server, responses, cached = asyncio.run(serve_and_query(executor, [(turn, {'deadline': 1e-6}),
+                                                                           ((['Qd', '4c'],), {})]))
+    assert responses[0] == {'id': 0, 'error': DEADLINE_EXCEEDED}
+    assert 'win_prob' in responses[1]
+    # The computation is not cancelled, a later query of the spot shares it or reads its cached result
+    assert cached['coalesced'] and 'win_prob' in cached
+
+
+def test_invalid_query_is_an_error():
+    with Executor('serial') as executor:
+        _, responses, _ = asyncio.run(serve_and_query(executor, [((['Qd', '4c'], [], 0), {}),
+                                                                 ((['Qd', 'Qd'],), {}),
+                                                                 ((['Qd', '4c'],), {})]))
+    assert 'error' in responses[0] and 'error' in responses[1] and 'win_prob' in responses[2]
@@ -0,0 +1,93 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from poker.evaluator import evaluate_strength
+from poker.ranges import PocketsShowdown
+from poker.showdown import RunoutShowdown
+from poker.suit_classes import class_showdown_counts
+from poker.vectorized import combinations_array, evaluate_strengths_array
+
+# (pocket, board) codes: rainbow, two-tone and monotone boards of every street
+SPOTS = [((48, 49), (0, 21, 34)),
+         ((51, 38), (2, 18, 22, 33)),
+         ((12, 13), (1, 5, 9, 26)),
+         ((45, 50), (0, 16, 40, 41)),
+         ((24, 25), (3, 15, 27, 39, 44)),
+         ((47, 43), (3, 7, 11, 28, 49))]
+
+
+def brute_force_counts(pocket, board):
+    # Wins, ties and losses per runout from one scalar evaluation per (runout, opponent pocket)
+    deck = [code for code in range(52) if code not in pocket + board]
+    counts = list()
+    for runout in combinations(deck, 5 - len(board)):
+        mine = evaluate_strength(pocket + board + runout)
+        rest = [code for code in deck if code not in runout]
+        strengths = [evaluate_strength(opp + board + runout) for opp in combinations(rest, 2)]
+        counts.append((sum(mine > s for s in strengths), sum(mine == s for s in strengths),
+                       sum(mine < s for s in strengths)))
+    return np.array(counts)
+
+
+@pytest.mark.parametrize('pocket, board', [spot for spot in SPOTS if len(spot[1]) >= 4])
+def test_counts_match_brute_force(pocket, board):
+    expected = brute_force_counts(pocket, board)
+    for card_counts in (True, False):
+        showdown = RunoutShowdown.compute(pocket, board, card_counts=card_counts)
+        assert np.array_equal(np.stack([showdown.wins, showdown.ties, showdown.losses], axis=1), expected)
+
+
+@pytest.mark.parametrize('pocket, board', SPOTS)
+def test_suit_classes_match_concrete_enumeration(pocket, board):
+    showdown = RunoutShowdown.compute(pocket, board, card_counts=True)
+    deck = np.array([code for code in range(52) if code not in pocket + board], dtype=np.uint8)
+    runouts = deck[combinations_array(len(deck), 5 - len(board))]
+    hands = np.hstack([np.broadcast_to(np.array(pocket + board, dtype=np.uint8), (len(runouts), 2 + len(board))),
+                       runouts])
+    wins, ties, losses, categories = class_showdown_counts(np.array(board, dtype=np.uint8), deck, runouts,
+                                                           evaluate_strengths_array(hands))
+    assert np.array_equal(wins, showdown.wins)
+    assert np.array_equal(ties, showdown.ties)
+    assert np.array_equal(losses, showdown.losses)
+    assert np.array_equal(categories, showdown.opp_category_counts)
+
+
+@pytest.mark.parametrize('board', [(0, 21, 34), (2, 18, 22, 33), (3, 15, 27, 39, 44)])
+def test_pockets_showdown_matches_runout_showdown(board):
+    pockets_showdown = PocketsShowdown.compute(board)
+    for pocket in [(48, 49), (51, 38), (12, 13), (4, 30)]:
+        showdown = RunoutShowdown.compute(pocket, board, card_counts=False)
+        assert np.allclose(pockets_showdown.probs(pocket), showdown.probs())
+        result_dict = pockets_showdown.result_dict(pocket)
+        assert np.allclose(result_dict['my_probs'], showdown.my_probs())
+        assert np.allclose(result_dict['opponent_probs'], showdown.opponent_probs())
+
+
+def test_restrict_matches_later_street():
+    flop = RunoutShowdown.compute((48, 49), (0, 21, 34))
+    turn = RunoutShowdown.compute((48, 49), (0, 21, 34, 40))
+    restricted = flop.restrict((40,))
+    for name in ('wins', 'ties', 'losses', 'opp_category_counts'):
+        assert np.array_equal(getattr(restricted, name), getattr(turn, name)), name
+    # Per-card columns keep the flop deck, where the turn card is an empty column
+    turn_column = [code for code in range(52) if code not in (48, 49, 0, 21, 34)].index(40)
+    for name in ('card_wins', 'card_ties'):
+        assert not getattr(restricted, name)[:, turn_column].any()
+        assert np.array_equal(np.delete(getattr(restricted, name), turn_column, axis=1), getattr(turn, name)), name
+    assert np.isclose(restricted.equity(3), turn.equity(3))
+
+
+def test_potential_counts_cover_every_showdown():
+    showdown = RunoutShowdown.compute((48, 49), (0, 21, 34), card_counts=False, potential=True)
+    assert showdown.potential_counts.sum() == len(showdown.runouts) * showdown.pockets_num
+    potential = showdown.potential_dict()
+    assert 0 <= potential['ppot'] <= 1 and 0 <= potential['npot'] <= 1
+    assert np.isclose(sum(potential['histogram']), 1)
+
+
+def test_too_many_opponents_are_rejected():
+    showdown = RunoutShowdown.compute((48, 49), (0, 5, 10, 15))
+    with pytest.raises(ValueError):
+        showdown.equity(30)